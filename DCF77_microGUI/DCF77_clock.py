@@ -28,16 +28,12 @@ from debug_utility.pulses import *
 
 
 #------------------------------------------------------------------------------
-# triggering mechanism = one-second internal timer
-from machine import Timer
-
+# triggering mechanism = one-second internal timer, phase-locked on DCF77 second marks
 def one_second_timer_IRQ(timer):
     irq_state = machine.disable_irq()
     asyncio.timer_elapsed.set()
     machine.enable_irq(irq_state)
 
-timer = Timer(mode=Timer.PERIODIC, freq=1, callback=one_second_timer_IRQ)
-
 asyncio.timer_elapsed = asyncio.Event() # evolution possible du Screen : prendre en compte ThreadSafeFlag
 
 # define coroutine that executes each second
@@ -56,6 +52,7 @@ asyncio.create_task(one_second_coroutine())
 from DCF77.DCF77_device import DCF_device
 TONE_GPIO = const(7) # the GPIO where DCF signal is received by MCU
 dcf_clock = DCF_device(TONE_GPIO)
+dcf_clock.start_second_ticker(one_second_timer_IRQ)
 asyncio.create_task(dcf_clock.dcf_decoder.DCF_signal_monitoring())
 asyncio.create_task(dcf_clock.dcf_decoder.frame_decoder())
 
@@ -81,25 +78,16 @@ def fwdbutton(wri, row, col, cls_screen, text='Next'):
            text = text, shape = RECTANGLE)
     
 from DCF77.decoder_uGUIv1 import *   
-def time_status_rendering(dcf_device):
-    status = dcf_device.get_status()
-    state = status[0]
-    if state == SYNC:
-        blink = False
-        color = GREEN
-    elif state == SYNC_IN_PROGRESS:
-        blink = True
-        color = GREY
-    elif state == SYNC_FAILED:
-        blink = True
-        color = YELLOW
-    elif state == OUT_OF_SYNC:
-        blink = False
-        color = RED
-    else:
-        blink = True
-        color = WHITE
-    return (blink, color)
+# (blink, color) of the status LED, indexed by time state
+TIME_STATE_RENDERING = (
+    (True, WHITE),      # TIME_INIT
+    (False, RED),       # OUT_OF_SYNC
+    (True, GREY),       # SYNC_IN_PROGRESS
+    (True, YELLOW),     # SYNC_FAILED
+    (False, GREEN),     # SYNC
+    )
+# beyond this estimated holdover error the displayed second may be wrong: the status LED blinks
+HOLDOVER_LIMIT_US = const(500000)
 
 #------------------------------------------------------------------------------
 class DCF_clock_screen(Screen):
@@ -143,9 +131,27 @@ class DCF_clock_screen(Screen):
         row += 12
         self.lbl_sec = Label(wri_seconds, row, 100, '00', **labels)
         
+        self.time_state = None
+        self.blink = True
         # setup async coroutines
         self.reg_task(self.aclock_screen())
 
+    def after_open(self):
+        dcf_clock.subscribe(self.status_changed)
+        self.status_changed(dcf_clock.get_snapshot())
+
+    def on_hide(self):
+        dcf_clock.unsubscribe(self.status_changed)
+
+    def status_changed(self, snapshot):
+        # redraw the status LED on time state transitions only
+        if snapshot[0] == self.time_state:
+            return
+        self.time_state = snapshot[0]
+        self.blink, color = TIME_STATE_RENDERING[snapshot[0]]
+        self.led_status(True)
+        self.led_status.color(color)
+
     async def aclock_screen(self):
         def uv(phi):
             return rect(1, phi)
@@ -163,7 +169,6 @@ class DCF_clock_screen(Screen):
             self.lbl_temperature.value(f"{temperature:3.1f}")
             self.lbl_humidity.value(f"{humidity:3.1f}")
             t = dcf_clock.get_local_time()
-            blink, color = time_status_rendering(dcf_clock)
             # Format
             ## localtime : t[0]:year, t[1]:month, t[2]:mday, t[3]:hour, t[4]:minute, t[5]:second, t[6]:weekday, t[7]:time_zone, t[8]:time_is_valid
             hrs.value(hstart * uv(-t[3] * pi/6 - t[4] * pi / 360), CYAN)
@@ -172,13 +177,11 @@ class DCF_clock_screen(Screen):
             self.lbl_tim.value(f"{t[3]:02d}:{t[4]:02d}")
             self.lbl_sec.value(f"{t[5]:02d}")
             self.lbl_date.value(f"{days[t[6]-1]} {t[2]} {months[t[1]-1]}")
-            if blink == True:
-                if t[5]%2==0 : self.led_status(True)
-                else: self.led_status(False)
-                self.led_status.color(color)
+            holdover_us = dcf_clock.get_holdover_error()
+            if self.blink == True or (holdover_us is not None and holdover_us > HOLDOVER_LIMIT_US):
+                self.led_status(t[5]%2==0)
             else:
                 self.led_status(True)
-                self.led_status.color(color)
             D3.off()
             await asyncio.timer_elapsed.wait()
             D3.on()
@@ -204,17 +207,25 @@ class DCF_detail_screen(Screen):
         row = self.lbl_date.mrow + gap
         self.tb = Textbox(wri, row, 2, 120, 7) 
         self.reg_task(self.adetail_screen())
+
+    def after_open(self):
+        dcf_clock.subscribe(self.status_changed)
+
+    def on_hide(self):
+        dcf_clock.unsubscribe(self.status_changed)
+
+    def status_changed(self, snapshot):
+        # one line per received bit or status transition
+        status,ts_symbol,bit_rank,last_bit = snapshot
+        if last_bit == None:
+            last_bit = "x"
+        self.tb.append(f"{ts_symbol:>11s}   bit [{bit_rank:>02d}] :  {last_bit:1s} ")
        
     async def adetail_screen(self):
         while True:
             t = dcf_clock.get_local_time()
             # localtime : t[0]:year, t[1]:month, t[2]:mday, t[3]:hour, t[4]:minute, t[5]:second, t[6]:weekday, t[7]:time_zone
             self.lbl_date.value(f"{days[t[6]-1]} {t[2]} {months[t[1]-1]} {t[0]} {t[3]:02d}:{t[4]:02d}")
-            status,ts_symbol,bit_rank,last_bit = dcf_clock.get_status()
-            if last_bit == None:
-                last_bit = "x"
-#             self.tb.append(f"{ts_symbol:<11s} bit[{bit_rank:02d}]: {last_bit:1s} s{t[5]:02d}")
-            self.tb.append(f"{ts_symbol:>11s}   bit [{bit_rank:>02d}] :  {last_bit:1s} ")
 
             await asyncio.timer_elapsed.wait()
             asyncio.timer_elapsed.clear()
@@ -2,35 +2,77 @@ import uasyncio as asyncio
 from machine import Timer
 
 from DCF77.decoder_uGUIv1 import *
-from DCF77.local_time_calendar_uGUI import LocalTimeCalendar
+from DCF77.local_time_calendar_uGUI import LocalTimeCalendar, SecondTicker
+
+# status text shown on the detail screen, indexed by time state
+TIME_STATE_TEXT = ("init", "out of sync", "in progress", "frame fail", "sync'd")
 
 
 class DCF_device():
+    # key_in_gpio: GPIO of the tone signal, or a tuple of GPIOs of several receive chains (decoder fusion mode)
     def __init__(self,key_in_gpio):
         self.local_time = LocalTimeCalendar()
         self.dcf_decoder = DCF_Decoder(key_in_gpio, self.local_time)
+        # status snapshot, updated in place on each change: [time_state, ts_text, bit_rank, last_bit]
+        self._snapshot = list(self.get_status())
+        self._subscribers = []
+        self.dcf_decoder.set_status_listener(self._status_changed)
+
+    def subscribe(self, callback):
+        # callback(snapshot) is called only when the time state, the signal state or the last bit changes
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def get_snapshot(self):
+        # no allocation: the same list is returned and updated in place, copy it to keep it
+        return self._snapshot
+
+    def _status_changed(self, status):
+        snapshot = self._snapshot
+        snapshot[0] = status.time_state
+        snapshot[1] = TIME_STATE_TEXT[status.time_state]
+        snapshot[2] = status.last_received_frame_bit_rank
+        snapshot[3] = status.last_received_frame_bit
+        for callback in self._subscribers:
+            callback(snapshot)
     
+    def get_signal_metrics(self):
+        # snapshot list refreshed in place: jitter (us), out-of-window pulses and parity failures (per mille),
+        # pulses, frames, classifier separation; indices in DCF77.signal_metrics
+        return self.dcf_decoder.get_signal_metrics()
+
+    def start_second_ticker(self, callback):
+        # one-second tick phase-locked on the DCF77 second marks, replaces machine.Timer(freq=1)
+        self.local_time.set_ticker(SecondTicker(callback))
+
+    def get_phase_error(self):
+        # format: (phase error in us, locked)
+        return self.local_time.get_phase_error()
+
+    def get_holdover_error(self):
+        # estimated error of the local time in us since the last DCF77 second mark (disciplined holdover), None before the first sync
+        return self.local_time.get_holdover_error()
+
+    def get_drift_status(self):
+        # format: (oscillator frequency offset ppb, drift rate ppb per hour, frequency error ppb, samples)
+        return self.local_time.get_drift_status()
+
     def next_second(self):
         self.local_time.next_second()            
         
     def get_local_time(self):
         # Format:
-        ## localtime : t[0]:year, t[1]:month, t[2]:mday, t[3]:hour, t[4]:minute, t[5]:second, t[6]:weekday, t[7]:time_zone
+        ## localtime : t[0]:year, t[1]:month, t[2]:mday, t[3]:hour, t[4]:minute, t[5]:second, t[6]:weekday, t[7]:time_zone, t[8]:time_is_valid
+        # no allocation: the cached list of the calendar, read-only and updated in place, copy it to keep it
         return self.local_time.get_raw_time_and_date()
     
     def get_status(self):
-        ts = self.dcf_decoder.get_time_status()
-        time_state = ts[1]
-        if ts[1] == SYNC:
-            ts_text = "sync'd"
-        elif time_state == SYNC_IN_PROGRESS:
-            ts_text = "in progress"
-        elif time_state == SYNC_FAILED:
-            ts_text = "frame fail"
-        elif time_state == OUT_OF_SYNC:
-            ts_text = "out of sync"
-        else:
-            ts_text = "init"
+        time_state = self.dcf_decoder.get_time_status()[1]
+        ts_text = TIME_STATE_TEXT[time_state]
         ss = self.dcf_decoder.get_signal_status()
         bit_rank = ss[0]
         last_bit = ss[1]
@@ -68,9 +110,9 @@ if __name__ == "__main__":
             one_second_time_event.clear()
             dcf.local_time.next_second()
             print("\t"*5, dcf.get_local_time())
-            print(dcf.get_status())
+            print(dcf.get_status(), dcf.get_phase_error())
 
-    Timer(mode=Timer.PERIODIC, freq=1, callback=timer_IRQ)
+    dcf.start_second_ticker(timer_IRQ)
 #         self.one_second_time_event = uasyncio.ThreadSafeFlag()
     one_second_time_event = uasyncio.ThreadSafeFlag()
 
@@ -0,0 +1,224 @@
+"""
+DCF77 frame layout and integer decoding.
+
+A received frame is packed into two words, each kept below 2**30 so that they remain
+MicroPython small integers (no heap allocation while decoding):
+- word 0 holds frame bits 0 ... 28 : civil warning bits, call bit, time zone, start of time, minutes, P1
+- word 1 holds frame bits 29 ... 58 : hours, P2, day, week day, month, year, P3
+Bit n of the frame is bit (n - first bit of the word) of the word.
+
+The encoder is the inverse: encode_frame() builds the words of a set of fields and flags,
+frame_pulses() gives the pulse width of each second of the minute that sends them.
+"""
+from micropython import const
+
+HI_WORD_FIRST_BIT = const(29)
+FRAME_BITS = const(59)
+
+## field index in FIELDS
+ZONE = const(0)
+MINUTES = const(1)
+HOURS = const(2)
+DAY = const(3)
+WEEK_DAY = const(4)
+MONTH = const(5)
+YEAR = const(6)
+
+## field table : (word, shift, mask)
+FIELDS = (
+    (0, 17, 0x03), # time zone  bits 17 ... 18
+    (0, 21, 0x7F), # minutes    bits 21 ... 27
+    (1, 0, 0x3F),  # hours      bits 29 ... 34
+    (1, 7, 0x3F),  # day        bits 36 ... 41
+    (1, 13, 0x07), # week day   bits 42 ... 44
+    (1, 16, 0x1F), # month      bits 45 ... 49
+    (1, 21, 0xFF), # year       bits 50 ... 57
+    )
+
+## parity groups : (word, mask) , each group includes its parity bit
+PARITY_GROUPS = (
+    (0, 0xFF << 21),     # minutes + P1     bits 21 ... 28
+    (1, 0x7F),           # hours + P2       bits 29 ... 35
+    (1, 0x7FFFFF << 7),  # date + P3        bits 36 ... 58
+    )
+
+START_OF_FRAME_MASK = const(1)         # bit 0, always "0"
+START_OF_TIME_MASK = const(1 << 20)    # bit 20, always "1"
+
+## lookup tables, indexed by a byte
+# parity of the number of "1" in the byte
+PARITY_TABLE = bytes(bin(b).count("1") & 1 for b in range(256))
+# BCD byte (units in the low nibble, tens in the high nibble) to binary value
+BCD_TABLE = bytes((b & 0x0F) + 10*(b >> 4) for b in range(256))
+
+
+def pack_frame(bits, words):
+    """ pack the 59 first symbols of the bytearray bits into the 2-word list words """
+    lo = 0
+    for k in range(HI_WORD_FIRST_BIT):
+        lo |= bits[k] << k
+    hi = 0
+    for k in range(FRAME_BITS - HI_WORD_FIRST_BIT):
+        hi |= bits[HI_WORD_FIRST_BIT + k] << k
+    words[0] = lo
+    words[1] = hi
+
+def parity(value):
+    """ 1 if value has an odd number of "1" bits, else 0 """
+    p = 0
+    while value:
+        p ^= PARITY_TABLE[value & 0xFF]
+        value >>= 8
+    return p
+
+def field_value(words, field):
+    word, shift, mask = FIELDS[field]
+    return BCD_TABLE[(words[word] >> shift) & mask]
+
+def frame_parity_is_valid(words):
+    if words[0] & START_OF_FRAME_MASK:
+        return False
+    if not words[0] & START_OF_TIME_MASK:
+        return False
+    for word, mask in PARITY_GROUPS:
+        if parity(words[word] & mask):
+            return False
+    return True
+
+######################### encoding and prediction
+FIELD_COUNT = const(7)
+FRAME_MINUTE_MS = const(60000)
+CALL_BIT_MASK = const(1 << 15)         # bit 15, R: call bit, abnormal transmitter operation
+ANNOUNCEMENT_MASK = const(1 << 16)     # bit 16, A1: summer time change at the end of this hour
+LEAP_SECOND_MASK = const(1 << 19)      # bit 19, A2: leap second at the end of this hour
+FLAGS_MASK = const(CALL_BIT_MASK | ANNOUNCEMENT_MASK | LEAP_SECOND_MASK)
+
+## time zone field values
+CEST = const(1)  # summer time, UTC+2
+CET = const(2)   # winter time, UTC+1
+
+## pulse widths in ms, a second with no pulse is a minute marker
+PULSE_0_MS = const(100)
+PULSE_1_MS = const(200)
+MINUTE_SECONDS = const(60)
+LEAP_MINUTE_SECONDS = const(61)
+
+## parity bits : (word, mask) , same order as PARITY_GROUPS
+PARITY_BITS = (
+    (0, 1 << 28),   # P1
+    (1, 1 << 6),    # P2, bit 35
+    (1, 1 << 29),   # P3, bit 58
+    )
+
+## bits that can be predicted from the previous frame: start of frame, time zone, start of time,
+## time and date; civil warnings, call bit and announcement bits are not predictable
+PREDICTABLE_MASKS = (START_OF_FRAME_MASK | (0x03 << 17) | (0x1FF << 20), (1 << 30) - 1)
+
+# binary value 0 ... 99 to BCD byte
+BIN_TO_BCD_TABLE = bytes(((v//10) << 4) | (v%10) for v in range(100))
+DAYS_IN_MONTH = bytes((31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31))
+# days of a common year before the first of each month
+DAYS_BEFORE_MONTH = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+SATURDAY = const(6) # 2000-01-01
+
+
+def decode_fields(words, fields):
+    """ decode all the fields of the packed frame words into the list fields, indexed by field """
+    for field in range(FIELD_COUNT):
+        fields[field] = field_value(words, field)
+
+def copy_fields(source, destination):
+    for field in range(FIELD_COUNT):
+        destination[field] = source[field]
+
+def encode_frame(fields, words, flags=0):
+    """
+    build the packed frame words of the fields, with start bits and parity bits;
+    flags: CALL_BIT_MASK | ANNOUNCEMENT_MASK | LEAP_SECOND_MASK, outside the parity groups
+    """
+    words[0] = START_OF_TIME_MASK | (flags & FLAGS_MASK)
+    words[1] = 0
+    for field in range(FIELD_COUNT):
+        word, shift, mask = FIELDS[field]
+        words[word] |= (BIN_TO_BCD_TABLE[fields[field]] & mask) << shift
+    for group in range(3):
+        word, mask = PARITY_GROUPS[group]
+        if parity(words[word] & mask):
+            words[word] |= PARITY_BITS[group][1]
+
+def frame_bit(words, k):
+    if k < HI_WORD_FIRST_BIT:
+        return (words[0] >> k) & 1
+    return (words[1] >> (k - HI_WORD_FIRST_BIT)) & 1
+
+def unpack_frame(words, bits):
+    """ inverse of pack_frame: the 59 symbols of the 2-word list words into the bytearray bits """
+    for k in range(FRAME_BITS):
+        bits[k] = frame_bit(words, k)
+
+def frame_pulses(words, pulses, leap_second=False):
+    """
+    pulse width in ms of each second of the minute that sends words into pulses (61 bytes),
+    0 for the minute marker; returns the number of seconds, 61 in a minute with a leap second
+    (the inserted second 59 sends a "0", the marker moves to second 60)
+    """
+    for k in range(FRAME_BITS):
+        pulses[k] = PULSE_1_MS if frame_bit(words, k) else PULSE_0_MS
+    if leap_second:
+        pulses[FRAME_BITS] = PULSE_0_MS
+        pulses[FRAME_BITS + 1] = 0
+        return LEAP_MINUTE_SECONDS
+    pulses[FRAME_BITS] = 0
+    return MINUTE_SECONDS
+
+def days_in_month(year, month):
+    """ year: 2 digits, 2000 ... 2099 """
+    if month == 2 and year%4 == 0:
+        return 29
+    return DAYS_IN_MONTH[month - 1]
+
+def days_since_2000(year, month, day):
+    """ days from 2000-01-01 to a valid date, year: 2 digits """
+    days = 365*year + (year + 3)//4 + DAYS_BEFORE_MONTH[month - 1] + day - 1
+    if month > 2 and year%4 == 0:
+        days += 1
+    return days
+
+def fields_are_valid(fields):
+    """
+    True if every field is in range, the date exists and falls on the week day:
+    parity alone lets such frames through
+    """
+    if fields[ZONE] not in (1, 2) or fields[MINUTES] > 59 or fields[HOURS] > 23 or fields[YEAR] > 99:
+        return False
+    if not 1 <= fields[WEEK_DAY] <= 7 or not 1 <= fields[MONTH] <= 12:
+        return False
+    if not 1 <= fields[DAY] <= days_in_month(fields[YEAR], fields[MONTH]):
+        return False
+    return (days_since_2000(fields[YEAR], fields[MONTH], fields[DAY]) + SATURDAY - 1)%7 + 1 == fields[WEEK_DAY]
+
+def utc_minutes(fields):
+    """ minutes from 2000-01-01 00:00 UTC to the time of valid fields: frames compare across days and time zones """
+    days = days_since_2000(fields[YEAR], fields[MONTH], fields[DAY])
+    return (24*days + fields[HOURS])*60 + fields[MINUTES] - (120 if fields[ZONE] == CEST else 60)
+
+def next_minute(fields):
+    """ advance the fields by one minute, in place """
+    fields[MINUTES] += 1
+    if fields[MINUTES] < 60:
+        return
+    fields[MINUTES] = 0
+    fields[HOURS] += 1
+    if fields[HOURS] < 24:
+        return
+    fields[HOURS] = 0
+    fields[WEEK_DAY] = fields[WEEK_DAY]%7 + 1
+    fields[DAY] += 1
+    if fields[DAY] <= days_in_month(fields[YEAR], fields[MONTH]):
+        return
+    fields[DAY] = 1
+    fields[MONTH] += 1
+    if fields[MONTH] <= 12:
+        return
+    fields[MONTH] = 1
+    fields[YEAR] = (fields[YEAR] + 1)%100
@@ -1,5 +1,9 @@
-import uasyncio, ustruct, machine
+import uasyncio, ustruct, machine, utime
+from array import array
 from lib_pico.async_push_button import Button as DCF_signal_in
+from DCF77.DCF77_frame import *
+from DCF77.pulse_classifier import *
+from DCF77.signal_metrics import SignalMetrics
 
 import micropython
 micropython.alloc_emergency_exception_buf(100)
@@ -17,43 +21,240 @@ from debug_utility.pulses import *
 
 #SIGNAL
 ## signal states
-SIGNAL_INIT = const("SIGNAL_INIT")
-SIGNAL_RECEPTION_OK = const("RECEPTION_OK")
-SIGNAL_LATE = const("SIGNAL_LATE")
-SIGNAL_LOST = const("SIGNAL_LOST")
+SIGNAL_INIT = const(0)
+SIGNAL_RECEPTION_OK = const(1)
+SIGNAL_LATE = const(2)
+SIGNAL_LOST = const(3)
 ## signal events
-SIGNAL_RECEIVED = const("SIGNAL_RECEIVED")
-SIGNAL_TIMEOUT  = const("SIGNAL_TIMEOUT")
+SIGNAL_RECEIVED = const(0)
+SIGNAL_TIMEOUT  = const(1)
+SIGNAL_EVENT_COUNT = const(2)
 
 #TIME
 ## time states
-TIME_INIT = const("TIME_INIT")
-OUT_OF_SYNC = const("OUT_OF_SYNC")
-SYNC_IN_PROGRESS = const("SYNC_IN_PROGRESS")
-SYNC_FAILED = const("SYNC_FAILED")
-SYNC = const("SYNC")
+TIME_INIT = const(0)
+OUT_OF_SYNC = const(1)
+SYNC_IN_PROGRESS = const(2)
+SYNC_FAILED = const(3)
+SYNC = const(4)
 ## time events
-EoF_RECEIVED = const("EOF")
-FRAME_ERROR = const("FRAME_ERROR")
-FRAME_OK = const("FRAME_OK")
-MISSING_DATA = const("WRONG_NUMBER_OF_DATA")
+TIME_STARTED = const(0)
+TIME_SIGNAL_LOST = const(1)
+TIME_SIGNAL_BACK = const(2)
+FRAME_ERROR = const(3)
+FRAME_OK = const(4)
+MISSING_DATA = const(5)
+FRAME_PREDICTED = const(6)
+FAST_RESYNC = const(7)
+FRAME_CORRECTED = const(8)
+FRAME_UNCONFIRMED = const(9)
+TIME_EVENT_COUNT = const(10)
 
+## names, for debug output only
+SIGNAL_STATE_NAMES = ("SIGNAL_INIT", "RECEPTION_OK", "SIGNAL_LATE", "SIGNAL_LOST")
+SIGNAL_EVENT_NAMES = ("SIGNAL_RECEIVED", "SIGNAL_TIMEOUT")
+TIME_STATE_NAMES = ("TIME_INIT", "OUT_OF_SYNC", "SYNC_IN_PROGRESS", "SYNC_FAILED", "SYNC")
+TIME_EVENT_NAMES = ("TIME_INIT", "SIGNAL_LOST", "SIGNAL_RECEIVED", "FRAME_ERROR", "FRAME_OK",
+                    "WRONG_NUMBER_OF_DATA", "FRAME_PREDICTED", "FAST_RESYNC", "FRAME_CORRECTED",
+                    "FRAME_UNCONFIRMED")
+
+## transition tables: next state = table[state * EVENT_COUNT + event]
+NO_TRANSITION = const(255) # event ignored in this state, status left untouched
+_SIGNAL_TRANSITIONS = bytes((
+    # SIGNAL_RECEIVED      SIGNAL_TIMEOUT
+    SIGNAL_RECEPTION_OK,   SIGNAL_LATE, # SIGNAL_INIT
+    SIGNAL_RECEPTION_OK,   SIGNAL_LATE, # SIGNAL_RECEPTION_OK
+    SIGNAL_RECEPTION_OK,   SIGNAL_LOST, # SIGNAL_LATE
+    SIGNAL_RECEPTION_OK,   SIGNAL_LOST, # SIGNAL_LOST
+    ))
+_TIME_TRANSITIONS = bytes((
+    # STARTED          SIGNAL_LOST  SIGNAL_BACK       FRAME_ERROR  FRAME_OK MISSING_DATA PREDICTED FAST_RESYNC CORRECTED UNCONFIRMED
+    SYNC_IN_PROGRESS,  OUT_OF_SYNC, NO_TRANSITION,    SYNC_FAILED, SYNC,    SYNC_FAILED, SYNC,     SYNC,       SYNC,     SYNC_IN_PROGRESS, # TIME_INIT
+    SYNC_IN_PROGRESS,  OUT_OF_SYNC, SYNC_IN_PROGRESS, SYNC_FAILED, SYNC,    SYNC_FAILED, SYNC,     SYNC,       SYNC,     SYNC_IN_PROGRESS, # OUT_OF_SYNC
+    SYNC_IN_PROGRESS,  OUT_OF_SYNC, NO_TRANSITION,    SYNC_FAILED, SYNC,    SYNC_FAILED, SYNC,     SYNC,       SYNC,     SYNC_IN_PROGRESS, # SYNC_IN_PROGRESS
+    SYNC_IN_PROGRESS,  OUT_OF_SYNC, NO_TRANSITION,    SYNC_FAILED, SYNC,    SYNC_FAILED, SYNC,     SYNC,       SYNC,     SYNC_IN_PROGRESS, # SYNC_FAILED
+    SYNC_IN_PROGRESS,  OUT_OF_SYNC, NO_TRANSITION,    SYNC_FAILED, SYNC,    SYNC_FAILED, SYNC,     SYNC,       SYNC,     SYNC,             # SYNC
+    ))
+
+#FRAME
+## symbols recorded in the frame buffer
+BIT_0 = const(0)
+BIT_1 = const(1)
+MINUTE_MARK = const(2)
+_SYMBOL_TEXT = ("0", "1", "#")
+## 59 bits + leap second bit + minute marker
+FRAME_BUFFER_SIZE = const(61)
+
+#EDGE RING
+## the IRQ handler only records (ticks_us, level) of each edge, processed later by DCF_signal_monitoring;
+## in fusion mode the level entry is level | source index << 1
+EDGE_RING_SIZE = const(32)               # edges, must be a power of 2: the ring indices are masked
+_EDGE_RING_MASK = const(2*EDGE_RING_SIZE - 1) # 2 entries per edge
+assert EDGE_RING_SIZE & (EDGE_RING_SIZE - 1) == 0, "EDGE_RING_SIZE must be a power of 2"
+
+#PREDICTION
+## a frame failing parity is accepted when it differs from the predicted frame
+## by no more than PREDICTION_MAX_ERRORS bits, all with a confidence below PREDICTION_LOW_CONFIDENCE
+PREDICTION_MAX_ERRORS = const(3)
+PREDICTION_LOW_CONFIDENCE = const(128)
+PREDICTION_MAX_MINUTES = const(1440) # no prediction after one day without a valid frame
+
+#CORRECTION
+## a frame failing parity is corrected by flipping one bit in each failing parity group (two groups at most:
+## an even number of errors in a group does not fail parity), chosen among its CORRECTION_CANDIDATES least
+## confident bits, all below CORRECTION_MAX_CONFIDENCE; the candidate frames must pass parity and give valid
+## fields and date. They are ranked by the confidence of the flipped bits (likelihood) plus CORRECTION_DISAGREEMENT
+## per predictable bit that disagrees with the predicted frame; the best one is kept if it is ahead by CORRECTION_MARGIN
+CORRECTION_CANDIDATES = const(3)
+CORRECTION_MAX_CONFIDENCE = const(128)
+CORRECTION_DISAGREEMENT = const(256)
+CORRECTION_MARGIN = const(64)
+_NO_CANDIDATE = const(1 << 20)   # score of an invalid candidate frame
+
+#ACCEPTANCE
+## a frame that passes parity, or has been corrected, goes through the acceptance policies before it sets the clock:
+## - range: every field in range, the date exists and falls on the week day (fields_are_valid),
+## - clock: the frame agrees within +/- ACCEPT_CLOCK_MINUTES with the last accepted frame and the time elapsed since,
+##   the cached predicted frame is accepted straight away,
+## - consecutive: a frame the clock cannot vouch for (at start up, or disagreeing) is accepted once ACCEPT_CONSECUTIVE_FRAMES
+##   consecutive frames agree with each other; a single corrupted frame cannot move the clock
+## a frame waiting for its confirmation is not an error: FRAME_UNCONFIRMED keeps SYNC_IN_PROGRESS. The price is one minute
+## at start up, the first SYNC comes with the second valid frame (about 120 s instead of 60 s);
+## set_acceptance_policy(consecutive_frames=1) takes the first valid frame, a corrupted one included
+ACCEPT_CLOCK_MINUTES = const(1)
+ACCEPT_CONSECUTIVE_FRAMES = const(2)
+## rejection counters, see get_acceptance_status
+REJECT_RANGE = const(0)
+REJECT_CLOCK = const(1)
+REJECT_UNCONFIRMED = const(2)
+
+#FUSION
+## several receive chains, one GPIO each: their pulses are aligned on the second marks (each source
+## has its own latency) and each bit is decided by a vote weighted by confidence and source quality
+MAX_SOURCES = const(4)
+FUSION_WINDOW_US = const(400000) # a pulse within 400 ms of a fused second, latency corrected, belongs to it
+FUSION_WAIT_US = const(80000)    # once aligned, the pulses of a second agree within a few ms: a missing source is not waited for longer
+                                 # than its latency + FUSION_WAIT_US
+_QUALITY_SHIFT = const(3)        # source quality: EWMA of its pulse confidences (0 for rejected pulses), weight 1/8
+_OFFSET_SHIFT = const(3)         # source latency: EWMA, weight 1/8
+
+#FAST RESYNC
+## after OUT_OF_SYNC, SYNC is restored from a partial frame once the minute and hour fields
+## (bits 21 ... 35) have been received and all predictable bits agree with the prediction
+RESYNC_FIRST_REQUIRED_BIT = const(21)
+RESYNC_LAST_REQUIRED_BIT = const(35)
+
+
+class _EdgeSource():
+    """ one receive chain of the fusion mode: its GPIO, pulse classifier, latency and quality """
+    def __init__(self, decoder, index, key_in_gpio):
+        self.index = index
+        self._decoder = decoder
+        self._code = index << 1
+        self.signal_in = DCF_signal_in("tone%d" % index, key_in_gpio, pull=-1,
+               interrupt_service_routine=self._IRQ_handler,
+               debounce_delay=80,
+               active_HI=True, both_edge=True )
+        self.classifier = AdaptivePulseClassifier()
+        self.last_edge_us = 0
+        self.offset_us = 0   # latency relative to source 0
+        self.quality = 128   # 0 ... 255, voting weight
+
+    def _IRQ_handler(self, button):
+        self._decoder._record_edge(self._code | (1 if button.is_pressed else 0))
 
 
 class DCF_Decoder():
-    def __init__(self, key_in_gpio, local_time):
+    """
+    key_in_gpio: the GPIO of the tone signal, or a tuple of GPIOs of several receive chains (fusion mode)
+    """
+    def __init__(self, key_in_gpio, local_time, predictive=True, correction=True):
         self._DCF_clock_received = uasyncio.ThreadSafeFlag()
         self._DCF_frame_received = uasyncio.ThreadSafeFlag()
-        DCF_signal_in("tone", key_in_gpio, pull=-1,
-               interrupt_service_routine=self._DCF_clock_IRQ_handler,
-               debounce_delay=80,
-               active_HI=True, both_edge=True )
+        self._sources = None
+        if isinstance(key_in_gpio, (tuple, list)) and len(key_in_gpio) > 1:
+            if len(key_in_gpio) > MAX_SOURCES:
+                raise ValueError("too many sources")
+            self._sources = tuple(_EdgeSource(self, k, gpio) for k, gpio in enumerate(key_in_gpio))
+            self._signal_in = self._sources[0].signal_in
+        else:
+            if isinstance(key_in_gpio, (tuple, list)):
+                key_in_gpio = key_in_gpio[0]
+            self._signal_in = DCF_signal_in("tone", key_in_gpio, pull=-1,
+                   interrupt_service_routine=self._DCF_clock_IRQ_handler,
+                   debounce_delay=80,
+                   active_HI=True, both_edge=True )
         self._local_time = local_time
         self._status_controller = self._StatusController()
-        self._frame = ""
-        self._current_string = ""
+        # preallocated frame buffers: _bits and _words (the same bits, packed as they arrive)
+        # are filled by _push, _frame_words is the snapshot taken at the minute marker and
+        # read by frame_decoder
+        self._bits = bytearray(FRAME_BUFFER_SIZE)
+        self._confidences = bytearray(FRAME_BUFFER_SIZE)
+        self._bit_index = 0
+        self._words = [0, 0]
+        self._frame_confidences = bytearray(FRAME_BUFFER_SIZE)
+        self._frame_length = 0
+        self._frame_words = [0, 0] # packed frame, see DCF77_frame
         self._DCF_signal_duration =0
         self._DCF_signal_is_high = True
+        self._second_mark_us = 0          # ticks_us of the last rising edge classified as a valid pulse
+        self._second_mark_pending = False
+        # edge ring buffer, written by the IRQ handler: [ticks_us, level, ticks_us, level, ...]
+        self._edges = array("I", [0]*(2*EDGE_RING_SIZE))
+        self._edge_head = 0      # written by the IRQ handler
+        self._edge_tail = 0      # written by _process_edges
+        self._edge_overflows = 0 # edges lost because the ring was full
+        self._edge_high_water = 0
+        self._last_edge_us = 0
+        self._classifier = AdaptivePulseClassifier() if self._sources is None else self._sources[0].classifier
+        # fusion: votes of the second being fused, one entry per source
+        sources = 1 if self._sources is None else len(self._sources)
+        self._votes = bytearray(sources)          # pulse classification
+        self._vote_confidences = bytearray(sources)
+        self._vote_edges = array("I", [0]*sources) # ticks_us of the rising edge
+        self._voted = 0        # bit mask of the sources that voted for the open second
+        self._expected = 0     # sources heard at the previous second: the open second waits for them
+        self._slot_open = False
+        self._slot_us = 0      # ticks_us of the open second, source 0 time base
+        self._slot_deadline_us = 0 # the open second is closed by the first edge after this time
+        self._metrics = SignalMetrics()
+        # predictive mode: the next frame is predicted from the last accepted one
+        self._predictive = predictive
+        self._frame_fields = [0]*FIELD_COUNT      # indexed by field, see DCF77_frame
+        self._reference_fields = [0]*FIELD_COUNT  # last accepted frame
+        self._reference_ms = 0
+        self._reference_is_valid = False
+        self._predicted_fields = [0]*FIELD_COUNT
+        self._predicted_words = [0, 0]
+        self._agreeing_frames = 0   # consecutive frames agreeing with the prediction
+        self._predicted_frames = 0  # frames accepted thanks to the prediction
+        self._predicted_minutes = 0 # minutes between the reference and the predicted frame
+        # acceptance policies
+        self._clock_minutes = ACCEPT_CLOCK_MINUTES
+        self._consecutive_frames = ACCEPT_CONSECUTIVE_FRAMES
+        self._clock_is_valid = False
+        self._reference_minute = 0   # UTC minutes of the last accepted frame, see DCF77_frame.utc_minutes
+        self._candidate_minute = 0   # last frame waiting for confirmation
+        self._candidate_ms = 0
+        self._candidate_frames = 0   # consecutive frames agreeing with each other, not confirmed yet
+        self._rejections = [0, 0, 0] # indexed by REJECT_RANGE ...
+        self._rejection = REJECT_UNCONFIRMED # policy that rejected the last frame
+        # correction of the frames failing parity
+        self._correction = correction
+        self._weak_bits = bytearray(2*CORRECTION_CANDIDATES) # per failing group: frame bit indices, least confident first
+        self._weak_counts = bytearray(2)
+        self._candidate_words = [0, 0]
+        self._candidate_fields = [0]*FIELD_COUNT
+        self._corrected_frames = 0
+        self._corrected_bits = 0     # bits flipped in the last corrected frame
+        self._ambiguous_frames = 0   # frames with several equally likely corrections
+        # fast resync from a partial frame
+        self._resync_active = False
+        self._resync_aligned = False # bit index == second in minute (a minute marker has been received)
+        self._resync_base = 0        # estimated second in minute of the bit at index 0
+        self._fast_resyncs = 0
+        self._resync_saved_seconds = 0 # seconds saved by the last fast resync
     
     def get_time_status(self):
         return [self._status_controller.time_event, self._status_controller.time_state, self._status_controller.error_message]
@@ -62,85 +263,565 @@ class DCF_Decoder():
         return [self._status_controller.last_received_frame_bit_rank, self._status_controller.last_received_frame_bit,
                 self._status_controller.signal_event, self._status_controller.signal_state]
 
-    def _push(self, data):
-        self._current_string += data
-        self._status_controller.signal_received(data, len(self._current_string))
-        if data == "#" :
-            self._frame = self._current_string
-            self._current_string = ""
+    def set_status_listener(self, callback):
+        # callback(status_controller) is called on each change of time state, signal state or last
+        # received bit, from the decoder coroutines (never from the IRQ handler)
+        self._status_controller.listener = callback
+
+    def get_prediction_status(self):
+        return (self._agreeing_frames, self._predicted_frames)
+
+    def set_acceptance_policy(self, clock_minutes=ACCEPT_CLOCK_MINUTES, consecutive_frames=ACCEPT_CONSECUTIVE_FRAMES):
+        """ clock_minutes: None disables the clock policy; consecutive_frames: 1 accepts unconfirmed frames """
+        self._clock_minutes = clock_minutes
+        self._consecutive_frames = consecutive_frames
+        self._candidate_frames = 0
+
+    def get_acceptance_status(self):
+        # format: frames rejected by the range, clock and consecutive policies
+        return (self._rejections[REJECT_RANGE], self._rejections[REJECT_CLOCK], self._rejections[REJECT_UNCONFIRMED])
+
+    def get_correction_status(self):
+        # format: frames corrected, bits flipped in the last one, frames left uncorrected (ambiguous)
+        return (self._corrected_frames, self._corrected_bits, self._ambiguous_frames)
+
+    def get_resync_status(self):
+        return (self._fast_resyncs, self._resync_saved_seconds)
+
+    def get_edge_ring_status(self):
+        # format: edges lost, high-water mark (edges)
+        return (self._edge_overflows, self._edge_high_water)
+
+    def get_signal_metrics(self):
+        # preallocated list, see signal_metrics for the indices
+        return self._metrics.snapshot(self._classifier)
+
+    def get_signal_histograms(self):
+        # format: (low level, high level) duration histograms, see signal_metrics for the bins
+        return (self._metrics.low_histogram, self._metrics.high_histogram)
+
+    def get_source_status(self):
+        # fusion mode, one entry per source: (quality 0 ... 255, latency relative to source 0 in us,
+        # bits classified, pulses rejected); None with a single source
+        if self._sources is None:
+            return None
+        return [(source.quality, source.offset_us, source.classifier.classified, source.classifier.rejected)
+                for source in self._sources]
+
+    def get_classifier_status(self):
+        # format: (mean_1, spread_1, mean_0, spread_0, boundary) in ms, bits classified, pulses rejected
+        return (self._classifier.get_clusters(), self._classifier.classified, self._classifier.rejected)
+
+    def _push(self, symbol, confidence=255):
+        # called by _process_edges: no heap allocation here
+        if self._status_controller.time_state == OUT_OF_SYNC:
+            # the signal is back: the partial frame is meaningless, bits are positioned with the local second
+            self._bit_index = 0
+            self._words[0] = 0
+            self._words[1] = 0
+            self._resync_active = self._reference_is_valid
+            self._resync_aligned = False
+            self._resync_base = self._local_time.second - 1
+        index = self._bit_index
+        if index < FRAME_BUFFER_SIZE:
+            self._bits[index] = symbol
+            self._confidences[index] = confidence
+        # packed as it arrives: a constant number of operations per bit, none per frame
+        if symbol == 1:
+            if index < HI_WORD_FIRST_BIT:
+                self._words[0] |= 1 << index
+            elif index < FRAME_BITS:
+                self._words[1] |= 1 << (index - HI_WORD_FIRST_BIT)
+        self._bit_index = index + 1
+        self._status_controller.signal_received(_SYMBOL_TEXT[symbol], index + 1)
+        if symbol == MINUTE_MARK :
+            self._frame_words[0] = self._words[0]
+            self._frame_words[1] = self._words[1]
+            self._words[0] = 0
+            self._words[1] = 0
+            self._frame_confidences[:] = self._confidences
+            self._frame_length = index + 1
+            self._bit_index = 0
+            self._resync_aligned = True
+            self._resync_base = 0
   
     def _DCF_clock_IRQ_handler(self, button):
+        # timestamp only: everything else is done by _process_edges
+        self._record_edge(1 if button.is_pressed else 0)
+
+    def _record_edge(self, code):
+        # IRQ context: code is the level, | source index << 1 in fusion mode
         D1.on()
+        head = self._edge_head
+        next_head = (head + 2) & _EDGE_RING_MASK
+        if next_head == self._edge_tail:
+            self._edge_overflows += 1
+        else:
+            self._edges[head] = utime.ticks_us()
+            self._edges[head + 1] = code
+            self._edge_head = next_head
         self._DCF_clock_received.set()
-        irq_state = machine.disable_irq()
-        self._DCF_signal_duration = button.last_event_duration
-        self._DCF_signal_is_high = button.is_pressed           
-        if self._DCF_signal_is_high :
-            # we check the previous low level duration:
-            # - about 800ms means previous hi-level is 200ms long (i.e. logic "1")
-            # - about 900ms means previous hi-level is 100ms long (i.e. logic "0")
-            # - more than 1000ms means we've had a 1-second silent signal that means "next minute"
-            #   including 800ms or 900ms for the 59th bit 
-            if self._DCF_signal_duration >= 750 and self._DCF_signal_duration < 850 :
-                self._push("1") # we record a logic "1" signal
-            elif self._DCF_signal_duration >= 850 and self._DCF_signal_duration < 950 :
-                self._push("0") # we record a logic "0" signal
-            elif self._DCF_signal_duration >= 1750 and self._DCF_signal_duration < 1950 :
-                if self._DCF_signal_duration < 1850 :
-                    self._push("1") # we record a logic last "1" signal
-                else :
-                    self._push("0") # we record a logic last "0" signal
-                self._push("#") # we record a "next minute" signal (coded by "#")
-                self._DCF_frame_received.set()
-        machine.enable_irq(irq_state)
         D1.off()
-         
-    def _BCD_decoder(self, string):
-        BCD_weight = [1, 2, 4, 8, 10, 20, 40, 80]
-        value = 0
-        for k in range(len(string)):
-            value += BCD_weight[k]*int(string[k])
-        return value
-    
+
+    def _process_edges(self):
+        """ drain the edge ring: classification, frame assembly and status updates """
+        tail = self._edge_tail
+        fill = ((self._edge_head - tail) & _EDGE_RING_MASK) >> 1
+        if fill > self._edge_high_water:
+            self._edge_high_water = fill
+        while tail != self._edge_head:
+            edge_us = self._edges[tail]
+            code = self._edges[tail + 1]
+            tail = (tail + 2) & _EDGE_RING_MASK
+            self._edge_tail = tail
+            if self._sources is not None:
+                self._fusion_edge(edge_us, code)
+                continue
+            self._DCF_signal_is_high = code
+            self._DCF_signal_duration = utime.ticks_diff(edge_us, self._last_edge_us)//1000
+            self._last_edge_us = edge_us
+            if self._DCF_signal_is_high :
+                # we check the previous low level duration:
+                # - about 800ms means previous hi-level is 200ms long (i.e. logic "1")
+                # - about 900ms means previous hi-level is 100ms long (i.e. logic "0")
+                # - more than 1000ms means we've had a 1-second silent signal that means "next minute"
+                #   including 800ms or 900ms for the 59th bit 
+                # the exact windows are learnt by the adaptive classifier, a lookup table gives the symbol
+                pulse = self._classifier.classify(self._DCF_signal_duration)
+                self._metrics.low_level(self._DCF_signal_duration, pulse == PULSE_INVALID)
+                if pulse != PULSE_INVALID :
+                    # this rising edge is a DCF77 second mark
+                    self._metrics.second_mark_interval(utime.ticks_diff(edge_us, self._second_mark_us), pulse & PULSE_MARK)
+                    self._second_mark_us = edge_us
+                    self._second_mark_pending = True
+                    self._push(pulse & 1, self._classifier.confidence) # we record a logic "1" or "0" signal
+                    if pulse & PULSE_MARK :
+                        self._push(MINUTE_MARK) # we record a "next minute" signal (coded by "#")
+                        self._DCF_frame_received.set()
+            else:
+                self._metrics.high_level(self._DCF_signal_duration)
+
+    ######################### fusion mode, no allocation
+    def _fusion_edge(self, edge_us, code):
+        source = self._sources[code >> 1]
+        duration = utime.ticks_diff(edge_us, source.last_edge_us)//1000
+        source.last_edge_us = edge_us
+        aligned_us = utime.ticks_add(edge_us, -source.offset_us)
+        if self._slot_open and utime.ticks_diff(edge_us, self._slot_deadline_us) > 0:
+            self._close_slot()
+        if not code & 1:
+            return # falling edge: the low-level duration before the next rising edge gives the bit
+        classifier = source.classifier
+        pulse = classifier.classify(duration)
+        confidence = classifier.confidence
+        source.quality += (confidence - source.quality) >> _QUALITY_SHIFT
+        if pulse == PULSE_INVALID:
+            return
+        mask = 1 << source.index
+        if not self._slot_open:
+            since = utime.ticks_diff(aligned_us, self._slot_us)
+            if -FUSION_WINDOW_US < since < FUSION_WINDOW_US:
+                # late for the last second: only its latency is learnt, and it is waited for next time
+                self._learn_offset(source, since)
+                self._expected |= mask
+                return
+            self._slot_open = True
+            self._slot_us = aligned_us
+            self._voted = 0
+            # the pulses of the sources still expected arrive with their own latency
+            latest = source.offset_us
+            for other in self._sources:
+                if self._expected & (1 << other.index) and other.offset_us > latest:
+                    latest = other.offset_us
+            self._slot_deadline_us = utime.ticks_add(aligned_us, latest + FUSION_WAIT_US)
+        elif self._voted & mask:
+            return # already voted for this second
+        k = source.index
+        self._votes[k] = pulse
+        self._vote_confidences[k] = confidence
+        self._vote_edges[k] = edge_us
+        self._voted |= mask
+        if self._voted & self._expected == self._expected:
+            self._close_slot()
+
+    def _learn_offset(self, source, error_us):
+        # error_us: aligned time of the source - time of the fused second
+        if source.index == 0:
+            return
+        if error_us > FUSION_WAIT_US or error_us < -FUSION_WAIT_US:
+            source.offset_us += error_us # acquisition
+        else:
+            source.offset_us += error_us >> _OFFSET_SHIFT
+
+    def _close_slot(self):
+        """ vote of the sources for the second: bit, confidence, minute marker """
+        self._slot_open = False
+        voted = self._voted
+        markers = 0
+        for k in range(len(self._sources)):
+            if voted & (1 << k) and self._votes[k] & PULSE_MARK:
+                markers |= 1 << k
+        # a pulse lost by one source looks like a minute marker to that source: the marker must be
+        # unanimous, and the votes that disagree with the decision are not counted
+        marker = markers == voted
+        score = 0
+        total = 0
+        best_quality = -1
+        mark_us = self._slot_us
+        for source in self._sources:
+            k = source.index
+            if not voted & (1 << k) or bool(markers & (1 << k)) != marker:
+                continue
+            weight = source.quality + 1
+            vote = weight*self._vote_confidences[k]
+            score += vote if self._votes[k] & 1 else -vote
+            total += weight*255
+            if voted & 1 and k:
+                self._learn_offset(source, utime.ticks_diff(self._vote_edges[k], self._vote_edges[0]) - source.offset_us)
+            if source.quality > best_quality:
+                # the second mark is timed by the best source, in the time base of source 0
+                best_quality = source.quality
+                mark_us = utime.ticks_add(self._vote_edges[k], -source.offset_us)
+        self._expected = voted
+        confidence = (score if score > 0 else -score)*255//total
+        self._metrics.second_mark_interval(utime.ticks_diff(mark_us, self._second_mark_us), marker)
+        self._second_mark_us = mark_us
+        self._second_mark_pending = True
+        self._push(1 if score > 0 else 0, confidence)
+        if marker:
+            self._push(MINUTE_MARK)
+            self._DCF_frame_received.set()
+
     def _frame_parity_is_valid(self):
-        s0 = (self._frame[0]  == "0") # check start of frame, always "0"
-        s1 = (self._frame[20] == "1") # check start of time encoding, always "1"
-        p1 = (self._frame[21:29].count("1")%2 == 0) # check parity
-        p2 = (self._frame[29:36].count("1")%2 == 0) # check parity
-        p3 = (self._frame[36:59].count("1")%2 == 0) # check parity
-        return (s0 and s1 and p1 and p2 and p3)        
+        return frame_parity_is_valid(self._frame_words)
 
     def _all_bits_received(self):
-        return len(self._frame)==60
+        return self._frame_length==60
         
+    def _elapsed_ms(self):
+        return utime.ticks_diff(utime.ticks_ms(), self._reference_ms)
+
+    def _predict_frame(self, minutes):
+        # the frame expected minutes after the reference frame
+        if not (self._predictive and self._reference_is_valid):
+            return False
+        if minutes < 1 or minutes > PREDICTION_MAX_MINUTES:
+            return False
+        if minutes != self._predicted_minutes:
+            copy_fields(self._reference_fields, self._predicted_fields)
+            for _ in range(minutes):
+                next_minute(self._predicted_fields)
+            encode_frame(self._predicted_fields, self._predicted_words)
+            self._predicted_minutes = minutes
+        return True
+
+    def _prediction_errors(self):
+        # number of predictable bits that disagree with the prediction, or PREDICTION_MAX_ERRORS + 1
+        # as soon as one of them is received with a high confidence
+        errors = 0
+        for word in range(2):
+            diff = (self._frame_words[word] ^ self._predicted_words[word]) & PREDICTABLE_MASKS[word]
+            first_bit = word*HI_WORD_FIRST_BIT
+            k = 0
+            while diff:
+                if diff & 1:
+                    errors += 1
+                    if self._frame_confidences[first_bit + k] >= PREDICTION_LOW_CONFIDENCE:
+                        return PREDICTION_MAX_ERRORS + 1
+                diff >>= 1
+                k += 1
+        return errors
+
+    def _set_reference(self, fields, announcement):
+        # no prediction across a summer time change
+        self._reference_is_valid = not announcement
+        self._resync_active = False
+        copy_fields(fields, self._reference_fields)
+        self._reference_ms = utime.ticks_ms()
+        self._reference_minute = utc_minutes(fields)
+        self._clock_is_valid = True
+        self._predicted_minutes = 0
+
+    def _frame_is_accepted(self, predicted):
+        """ clock and consecutive policies, see ACCEPTANCE, for valid self._frame_fields """
+        if predicted and self._prediction_errors() == 0:
+            return True # the cached expected frame
+        minute = utc_minutes(self._frame_fields)
+        now_ms = utime.ticks_ms()
+        # a rejected frame is counted once, under the first policy that rejected it
+        rejection = REJECT_UNCONFIRMED
+        if self._clock_minutes is not None and self._clock_is_valid:
+            elapsed = (utime.ticks_diff(now_ms, self._reference_ms) + FRAME_MINUTE_MS//2)//FRAME_MINUTE_MS
+            if elapsed <= PREDICTION_MAX_MINUTES:
+                if abs(minute - self._reference_minute - elapsed) <= self._clock_minutes:
+                    self._candidate_frames = 0
+                    return True
+                rejection = REJECT_CLOCK
+        # consecutive frames, one minute apart: they can still move a clock they disagree with
+        elapsed = (utime.ticks_diff(now_ms, self._candidate_ms) + FRAME_MINUTE_MS//2)//FRAME_MINUTE_MS
+        if self._candidate_frames and minute - self._candidate_minute == elapsed:
+            self._candidate_frames += 1
+        else:
+            self._candidate_frames = 1
+        self._candidate_minute = minute
+        self._candidate_ms = now_ms
+        if self._candidate_frames >= self._consecutive_frames:
+            self._candidate_frames = 0
+            return True
+        self._rejections[rejection] += 1
+        self._rejection = rejection
+        return False
+
+    def _decode_frame(self):
+        if not self._all_bits_received():   
+            self._status_controller.frame_incomplete(self._frame_length)
+            self._agreeing_frames = 0
+            self._metrics.next_minute()
+            return
+        predicted = self._predict_frame((self._elapsed_ms() + FRAME_MINUTE_MS//2)//FRAME_MINUTE_MS)
+        parity_ok = self._frame_parity_is_valid()
+        fields_ok = False
+        if parity_ok:
+            decode_fields(self._frame_words, self._frame_fields)
+            # even parity lets double errors through: out of range fields are not a frame either
+            fields_ok = fields_are_valid(self._frame_fields)
+        self._metrics.frame_decoded(parity_ok)
+        corrected = not fields_ok and self._correction and self._correct_frame(predicted)
+        if fields_ok or corrected:
+            # the frame itself, or the most likely frame that passes parity
+            if not self._frame_is_accepted(predicted):
+                if self._rejection == REJECT_UNCONFIRMED:
+                    self._status_controller.frame_unconfirmed()
+                else:
+                    self._status_controller.frame_rejected()
+                self._agreeing_frames = 0
+                return
+            if predicted and self._prediction_errors() == 0:
+                self._agreeing_frames += 1
+            else:
+                self._agreeing_frames = 0
+            if corrected:
+                self._corrected_frames += 1
+                self._status_controller.frame_corrected(self._corrected_bits)
+            else:
+                self._status_controller.frame_OK()
+        elif predicted and self._prediction_errors() <= PREDICTION_MAX_ERRORS:
+            # the bits in error are few and weak: we trust the prediction
+            copy_fields(self._predicted_fields, self._frame_fields)
+            self._agreeing_frames += 1
+            self._predicted_frames += 1
+            self._status_controller.frame_predicted()
+        else:
+            if parity_ok:
+                # counted here only: the correction and the prediction did not rescue it
+                self._rejections[REJECT_RANGE] += 1
+                self._status_controller.frame_out_of_range()
+            else:
+                self._status_controller.frame_parity_error()
+            self._agreeing_frames = 0
+            return
+        # finally we have a full frame without reception error
+        self._set_reference(self._frame_fields, self._frame_words[0] & ANNOUNCEMENT_MASK)
+        self._sync_local_time(self._frame_fields, 0)
+
+    def _find_weak_bits(self, slot, group):
+        # the CORRECTION_CANDIDATES least confident bits of a parity group, below CORRECTION_MAX_CONFIDENCE
+        word, mask = PARITY_GROUPS[group]
+        first = slot*CORRECTION_CANDIDATES
+        count = 0
+        for k in range(30):
+            if not (mask >> k) & 1:
+                continue
+            index = word*HI_WORD_FIRST_BIT + k
+            confidence = self._frame_confidences[index]
+            if confidence >= CORRECTION_MAX_CONFIDENCE:
+                continue
+            # insertion into the list, least confident first; the last one drops out when it is full
+            position = count
+            while position > 0 and self._frame_confidences[self._weak_bits[first + position - 1]] > confidence:
+                if position < CORRECTION_CANDIDATES:
+                    self._weak_bits[first + position] = self._weak_bits[first + position - 1]
+                position -= 1
+            if position < CORRECTION_CANDIDATES:
+                self._weak_bits[first + position] = index
+                count = min(count + 1, CORRECTION_CANDIDATES)
+        self._weak_counts[slot] = count
+
+    def _flip(self, words, index):
+        if index < HI_WORD_FIRST_BIT:
+            words[0] ^= 1 << index
+        else:
+            words[1] ^= 1 << (index - HI_WORD_FIRST_BIT)
+
+    def _candidate_score(self, a, b, predicted):
+        # score of the frame with bits a and b flipped (b < 0: a only), _NO_CANDIDATE if it is not a valid frame
+        words = self._candidate_words
+        words[0] = self._frame_words[0]
+        words[1] = self._frame_words[1]
+        self._flip(words, a)
+        score = self._frame_confidences[a]
+        if b >= 0:
+            self._flip(words, b)
+            score += self._frame_confidences[b]
+        if not frame_parity_is_valid(words):
+            return _NO_CANDIDATE
+        decode_fields(words, self._candidate_fields)
+        if not fields_are_valid(self._candidate_fields):
+            return _NO_CANDIDATE
+        if predicted:
+            # agreement with the local calendar: the frame expected from the last accepted one
+            for word in range(2):
+                diff = (words[word] ^ self._predicted_words[word]) & PREDICTABLE_MASKS[word]
+                while diff:
+                    score += CORRECTION_DISAGREEMENT*(diff & 1)
+                    diff >>= 1
+        return score
+
+    def _correct_frame(self, predicted):
+        """ maximum likelihood correction of a frame failing parity, see CORRECTION; True if corrected """
+        if self._frame_words[0] & START_OF_FRAME_MASK or not self._frame_words[0] & START_OF_TIME_MASK:
+            return False
+        failing = 0
+        for group in range(3):
+            word, mask = PARITY_GROUPS[group]
+            if parity(self._frame_words[word] & mask):
+                if failing == 2:
+                    return False
+                self._find_weak_bits(failing, group)
+                failing += 1
+        if failing == 0:
+            return False # an even number of errors in a group, fields out of range
+        best = second = _NO_CANDIDATE
+        best_a = best_b = -1
+        for i in range(self._weak_counts[0]):
+            a = self._weak_bits[i]
+            for j in range(self._weak_counts[1] if failing == 2 else 1):
+                b = self._weak_bits[CORRECTION_CANDIDATES + j] if failing == 2 else -1
+                score = self._candidate_score(a, b, predicted)
+                if score < best:
+                    second = best
+                    best = score
+                    best_a = a
+                    best_b = b
+                elif score < second:
+                    second = score
+        if best == _NO_CANDIDATE:
+            return False
+        if second - best < CORRECTION_MARGIN:
+            self._ambiguous_frames += 1
+            return False
+        self._candidate_score(best_a, best_b, predicted)
+        self._frame_words[0] = self._candidate_words[0]
+        self._frame_words[1] = self._candidate_words[1]
+        copy_fields(self._candidate_fields, self._frame_fields)
+        self._corrected_bits = failing
+        return True
+
+    def _sync_local_time(self, fields, second):
+        self._local_time.sync_time(ustruct.pack("6HB",
+             fields[YEAR], fields[MONTH], fields[DAY], fields[WEEK_DAY], fields[HOURS], fields[MINUTES], fields[ZONE]),
+             second)
+
+    def _partial_frame_agrees(self, base, count):
+        # True if the count first received bits, placed from second base, agree with the predicted frame
+        for index in range(count):
+            position = base + index
+            if position < HI_WORD_FIRST_BIT:
+                word = 0
+                shift = position
+            else:
+                word = 1
+                shift = position - HI_WORD_FIRST_BIT
+            if (PREDICTABLE_MASKS[word] >> shift) & 1:
+                if self._bits[index] != (self._predicted_words[word] >> shift) & 1:
+                    return False
+        return True
+
+    def _edge_received(self):
+        """ processing of the edges received since the last call, outside IRQ context """
+        self._process_edges()
+        if self._second_mark_pending:
+            self._second_mark_pending = False
+            self._local_time.second_mark(self._second_mark_us)
+        if self._resync_active:
+            self._try_fast_resync()
+
+    def _try_fast_resync(self):
+        """ called after each received bit while the decoder resynchronises after OUT_OF_SYNC """
+        count = self._bit_index
+        if count == 0 or count > FRAME_BITS:
+            return
+        # the frame being received is the one of the next minute marker
+        minutes = (self._elapsed_ms() + FRAME_MINUTE_MS - 1)//FRAME_MINUTE_MS
+        if not self._predict_frame(minutes):
+            self._resync_active = False
+            return
+        # before any minute marker, the local second gives the bit positions within +/- 1 s
+        candidates = 1 if self._resync_aligned else 3
+        match = -1
+        for k in range(candidates):
+            base = self._resync_base if self._resync_aligned else self._resync_base - 1 + k
+            if base < 0 or base + count > FRAME_BITS:
+                continue
+            if self._partial_frame_agrees(base, count):
+                if match >= 0:
+                    return # ambiguous position, wait for more bits
+                match = base
+        if match < 0:
+            if self._resync_aligned:
+                self._resync_active = False # the partial frame contradicts the prediction
+            return
+        if match > RESYNC_FIRST_REQUIRED_BIT or match + count <= RESYNC_LAST_REQUIRED_BIT:
+            # minutes and hours not received yet in this minute
+            return
+        # restore SYNC now, instead of waiting for the end of this minute (aligned),
+        # or for the end of the next one (not aligned)
+        second = match + count
+        self._resync_saved_seconds = 60 - second if self._resync_aligned else 120 - second
+        self._fast_resyncs += 1
+        self._resync_active = False
+        if match > 0:
+            self._align_partial_frame(match)
+        copy_fields(self._reference_fields, self._frame_fields)
+        for _ in range(self._predicted_minutes - 1):
+            next_minute(self._frame_fields)
+        self._sync_local_time(self._frame_fields, second)
+        self._status_controller.fast_resync()
+
+    def _align_partial_frame(self, base):
+        # move the partial frame so that bit index == second in minute, missing bits taken from the prediction
+        count = self._bit_index
+        for index in range(count - 1, -1, -1):
+            self._bits[base + index] = self._bits[index]
+            self._confidences[base + index] = self._confidences[index]
+        for position in range(base):
+            if position < HI_WORD_FIRST_BIT:
+                self._bits[position] = (self._predicted_words[0] >> position) & 1
+            else:
+                self._bits[position] = (self._predicted_words[1] >> (position - HI_WORD_FIRST_BIT)) & 1
+            self._confidences[position] = 0
+        self._bit_index = base + count
+        # the packed bits follow: the end of the buffer still holds the previous frame
+        for position in range(self._bit_index, FRAME_BITS):
+            self._bits[position] = 0
+        pack_frame(self._bits, self._words)
+        self._resync_aligned = True
+        self._resync_base = 0
+
     async def frame_decoder(self):
         """ coroutine that decodes DCF signal, triggered by the reception of End of Frame"""
         while True:
             D2.off()
             await self._DCF_frame_received.wait()
             D2.on()
-            if not self._all_bits_received():   
-                self._status_controller.frame_incomplete(len(self._frame))
-            else:
-                if not self._frame_parity_is_valid():
-                    self._status_controller.frame_parity_error()
-                else: # finally we have received a full frame without reception error
-                    self._status_controller.frame_OK()
-                    time_zone_num = self._BCD_decoder(self._frame[17:19])
-                    minutes = self._BCD_decoder(self._frame[21:28])
-                    hours = self._BCD_decoder(self._frame[29:35])
-                    day = self._BCD_decoder(self._frame[36:42])
-                    week_day_num = self._BCD_decoder(self._frame[42:45])
-                    month_num = self._BCD_decoder(self._frame[45:50])
-                    year = self._BCD_decoder(self._frame[50:58])
-                    self._local_time.sync_time(ustruct.pack("6HB",
-                         year, month_num, day, week_day_num, hours, minutes, time_zone_num))
+            self._decode_frame()
 
     async def DCF_signal_monitoring(self):
         while True:
             try:
                 await uasyncio.wait_for_ms(self._DCF_clock_received.wait(), 2000)
                 self._DCF_clock_received.clear()
+                self._edge_received()
 
             except uasyncio.TimeoutError:
                 self._status_controller.signal_timeout() 
@@ -148,69 +829,78 @@ class DCF_Decoder():
     class _StatusController():
         def __init__(self):
             # init time and signal status management
-            self.set_time_status(TIME_INIT, SYNC_IN_PROGRESS, "")
-            self.set_signal_status(1,"x",SIGNAL_INIT,SIGNAL_INIT) 
-            
+            self.listener = None # called with the controller on each change of state or last bit
+            self.time_state = TIME_INIT
+            self.time_transition(TIME_STARTED)
+            self.last_received_frame_bit_rank = 0
+            self.last_received_frame_bit = "x"
+            self.signal_event = SIGNAL_RECEIVED
+            self.signal_state = SIGNAL_INIT
+
         # Signal status management
-        def set_signal_status(self, frame_size, data, new_event, new_status):
+        def signal_transition(self, event, frame_size, data):
+            old_state = self.signal_state
+            new_state = _SIGNAL_TRANSITIONS[old_state * SIGNAL_EVENT_COUNT + event]
+            changed = (new_state != old_state or frame_size - 1 != self.last_received_frame_bit_rank
+                       or data != self.last_received_frame_bit)
             self.last_received_frame_bit_rank = frame_size -1
-            self.last_received_frame_bit = data            
-            self.signal_event = new_event
-            self.signal_state = new_status
-            
+            self.last_received_frame_bit = data
+            self.signal_event = event
+            self.signal_state = new_state
+            if changed and self.listener is not None:
+                self.listener(self)
+            if new_state == SIGNAL_LOST and old_state == SIGNAL_LATE:
+                self.time_transition(TIME_SIGNAL_LOST)
+
         def signal_received(self, data, frame_size):
             D4.on()
-            if self.time_state == OUT_OF_SYNC:
-                self.restart_sync()
-            event = SIGNAL_RECEIVED
-            self.set_signal_status(frame_size, data, event, SIGNAL_RECEPTION_OK)
+            self.time_transition(TIME_SIGNAL_BACK) # only leaves OUT_OF_SYNC
+            self.signal_transition(SIGNAL_RECEIVED, frame_size, data)
             D4.off()
-        
+
         def signal_timeout(self):
             D5.on()
-            if (self.signal_state == SIGNAL_LATE) :
-                self.set_signal_status( 0, None, SIGNAL_TIMEOUT, SIGNAL_LOST)
-                self.out_of_sync()
-            elif (self.signal_state == SIGNAL_LOST) :
-                self.set_signal_status( 0, None, SIGNAL_TIMEOUT, SIGNAL_LOST)
-            else:
-                self.set_signal_status( 0, None, SIGNAL_TIMEOUT, SIGNAL_LATE)
+            self.signal_transition(SIGNAL_TIMEOUT, 0, None)
             D5.off()
 
         # Time/Calendar status management
-        def set_time_status(self, new_event, new_status, message=""):
-            self.time_event = new_event
-            self.time_state = new_status
+        def time_transition(self, event, message=""):
+            new_state = _TIME_TRANSITIONS[self.time_state * TIME_EVENT_COUNT + event]
+            if new_state == NO_TRANSITION:
+                return
+            changed = new_state != self.time_state
+            self.time_event = event
+            self.time_state = new_state
             self.error_message = message
-            if new_status == SYNC :
+            if new_state == SYNC :
                 D6.on()
             else:
                 D6.off()
-
-            # entering new state
-        def out_of_sync(self):
-            self.set_time_status(SIGNAL_LOST ,OUT_OF_SYNC)
-        def sync_failed(self, error, message):
-            self.set_time_status(error, SYNC_FAILED, message)
-        def sync_done(self):
-            self.set_time_status(FRAME_OK, SYNC)
-        def restart_sync(self):
-            self.set_time_status(SIGNAL_RECEIVED, SYNC_IN_PROGRESS)
+            if changed and self.listener is not None:
+                self.listener(self)
 
             # processing event
         def frame_parity_error(self):
-            self.sync_failed(FRAME_ERROR, "parity error")
+            self.time_transition(FRAME_ERROR, "parity error")
+        def frame_out_of_range(self):
+            self.time_transition(FRAME_ERROR, "fields out of range")
         def frame_incomplete(self, frame_size):
             message = f"frame size: {str(frame_size)}"
-            self.sync_failed(MISSING_DATA, message)
+            self.time_transition(MISSING_DATA, message)
+        def frame_rejected(self):
+            self.time_transition(FRAME_ERROR, "frame disagrees with the clock")
+        def frame_unconfirmed(self):
+            self.time_transition(FRAME_UNCONFIRMED, "waiting for a confirming frame")
         def frame_OK(self):
-            self.sync_done()
+            self.time_transition(FRAME_OK)
+        def fast_resync(self):
+            self.time_transition(FAST_RESYNC)
+        def frame_predicted(self):
+            self.time_transition(FRAME_PREDICTED)
+        def frame_corrected(self, bits):
+            self.time_transition(FRAME_CORRECTED, f"{bits} bit(s) corrected")
     
     
-
-
-
-  
 ###############################################################################
 if __name__ == "__main__":
     print("test")
@@ -233,13 +923,13 @@ if __name__ == "__main__":
         def display_time_status(self, time_status):
             TIME_STATUS_TAB   = const("\t\t\t\t\t\t")
             D3.on()
-            print(f"{TIME_STATUS_TAB}{time_status}")
+            print(f"{TIME_STATUS_TAB}{TIME_EVENT_NAMES[time_status[0]]} {TIME_STATE_NAMES[time_status[1]]} {time_status[2]}")
             D3.off()
    
         def display_signal_status(self, signal_status):
             SIGNAL_STATUS_TAB = const("")
             D7.on()
-            print(f"{SIGNAL_STATUS_TAB}{signal_status}")
+            print(f"{SIGNAL_STATUS_TAB}{signal_status[0]} {signal_status[1]} {SIGNAL_EVENT_NAMES[signal_status[2]]} {SIGNAL_STATE_NAMES[signal_status[3]]}")
             D7.off()
 
 
@@ -0,0 +1,218 @@
+"""
+Local oscillator drift estimation, for the disciplined holdover of the one-second tick.
+
+The crystal of the board (utime.ticks_us and machine.Timer) is compared with the DCF77 minute
+boundaries: at each synchronisation of the calendar, the offset of the local clock (local us
+elapsed - DCF77 us elapsed, since the first sample) is recorded, at most one sample every
+DRIFT_SAMPLE_S seconds, in a sliding window of DRIFT_SAMPLES samples (about 2 hours).
+A least squares fit offset = a + b.t (+ c.t**2 once the window spans DRIFT_QUADRATIC_SPAN_S)
+gives the frequency offset at the last sample and the drift rate, with their standard errors.
+A sample far from the estimate (the calendar was resynchronised to another second) restarts the
+window; the estimate is kept until the new window spans DRIFT_MIN_SPAN_S.
+ticks_us wraps every 1073 s, so the local time is unwrapped at each tick (seconds + us).
+
+The fit runs once per sample, outside the edge path (floats); local_tick, second_mark and
+correction_ppb are integer only. Frequencies are in ppb (local - true, 1000 ppb = 1 us per second).
+"""
+from micropython import const
+from array import array
+import utime
+
+SECOND_US = const(1000000)
+DRIFT_SAMPLES = const(64)             # sliding window ...
+DRIFT_SAMPLE_S = const(120)           # ... one sample every 2 minutes at most: 2 hours
+DRIFT_MIN_SAMPLES = const(4)          # the estimate is fitted on 4 samples ...
+DRIFT_MIN_SPAN_S = const(600)         # ... over 10 minutes at least
+DRIFT_QUADRATIC_SPAN_S = const(3600)  # the drift rate is fitted on a window of one hour or more
+DRIFT_MAX_PPB = const(200000)         # a larger frequency offset is not a crystal: the fit is ignored
+DRIFT_OUTLIER_US = const(100000)      # a sample this far from the estimate restarts the window
+DRIFT_MAX_EXTRAPOLATION_S = const(14400) # the drift rate is not extrapolated further into a holdover
+DRIFT_DEFAULT_PPB = const(50000)      # frequency uncertainty without estimate: crystal tolerance
+DRIFT_DEFAULT_PPB_PER_HOUR = const(1000) # drift rate uncertainty while it is not fitted
+DRIFT_MIN_JITTER_US = const(1000)     # floor of the timing noise of the minute boundaries
+_DRIFT_LIMIT_PPB = const(1000000)
+_ERROR_LIMIT_US = const(1 << 29)
+_SECONDS_PER_DAY = const(86400)
+
+
+class DriftEstimator():
+    def __init__(self):
+        self._t = array("i", [0]*DRIFT_SAMPLES)   # DCF77 seconds since the first sample of the window
+        self._x = array("i", [0]*DRIFT_SAMPLES)   # local us - DCF77 us, since the first sample
+        self._count = 0
+        # first sample of the window: UTC (days, second of the day) and local time (s, us)
+        self._origin_days = 0
+        self._origin_seconds = 0
+        self._origin_local_s = 0
+        self._origin_local_us = 0
+        # local time unwrapped at each tick
+        self._local_s = 0
+        self._local_us = 0
+        self._last_tick_us = utime.ticks_us()
+        self._sample_local_s = 0   # local second of the last sample
+        self._mark_local_s = 0     # local second of the last DCF77 second mark
+        # estimate at the last sample
+        self.frequency_ppb = 0
+        self.drift_ppb_per_hour = 0
+        self.frequency_error_ppb = DRIFT_DEFAULT_PPB
+        self.drift_error_ppb_per_hour = DRIFT_DEFAULT_PPB_PER_HOUR
+        self.estimates = 0
+        self.restarts = 0
+
+    ######################### every second, no allocation
+    def local_tick(self, now_us):
+        self._local_us += utime.ticks_diff(now_us, self._last_tick_us)
+        self._last_tick_us = now_us
+        while self._local_us >= SECOND_US:
+            self._local_us -= SECOND_US
+            self._local_s += 1
+
+    def second_mark(self):
+        self._mark_local_s = self._local_s
+
+    def correction_ppb(self):
+        """ estimated frequency offset now, drift rate extrapolated from the last sample """
+        elapsed_s = self._local_s - self._sample_local_s
+        if elapsed_s > DRIFT_MAX_EXTRAPOLATION_S:
+            elapsed_s = DRIFT_MAX_EXTRAPOLATION_S
+        return self.frequency_ppb + self.drift_ppb_per_hour*(elapsed_s//60)//60
+
+    ######################### once per minute
+    def minute_boundary(self, mark_us, days, utc_second):
+        """
+        mark_us: ticks_us of the DCF77 second mark of UTC second utc_second of day days
+        (utc_second may be out of 0 ... 86399, the time zone removed from a local second)
+        returns True if a sample was added to the window
+        """
+        since_tick = utime.ticks_diff(mark_us, self._last_tick_us)
+        if not -SECOND_US < since_tick < 2*SECOND_US:
+            return False # no tick to unwrap the local time
+        if self._count:
+            t = (days - self._origin_days)*_SECONDS_PER_DAY + utc_second - self._origin_seconds
+            last_t = self._t[self._count - 1]
+            if t - last_t < DRIFT_SAMPLE_S:
+                return False
+            if t - last_t > DRIFT_SAMPLES*DRIFT_SAMPLE_S:
+                self._restart() # the window is older than its span
+        if self._count == DRIFT_SAMPLES:
+            self._drop_oldest()
+        local_us = self._local_us + since_tick
+        if not self._count:
+            self._origin_days = days
+            self._origin_seconds = utc_second
+            self._origin_local_s = self._local_s
+            self._origin_local_us = local_us
+        t = (days - self._origin_days)*_SECONDS_PER_DAY + utc_second - self._origin_seconds
+        x = (self._local_s - self._origin_local_s - t)*SECOND_US + local_us - self._origin_local_us
+        if self._count:
+            last = self._count - 1
+            expected = self._x[last] + (t - self._t[last])*self.frequency_ppb//1000
+            if abs(x - expected) > DRIFT_OUTLIER_US:
+                # the calendar jumped (resynchronised after a wrong frame, or a new time base)
+                self._restart()
+                return self.minute_boundary(mark_us, days, utc_second)
+        self._t[self._count] = t
+        self._x[self._count] = x
+        self._count += 1
+        self._sample_local_s = self._local_s
+        if self._count >= DRIFT_MIN_SAMPLES and t >= DRIFT_MIN_SPAN_S:
+            self._fit()
+        return True
+
+    def _restart(self):
+        self._count = 0
+        self.restarts += 1
+
+    def _drop_oldest(self):
+        # the second sample becomes the origin of the window
+        t1 = self._t[1]
+        x1 = self._x[1]
+        for k in range(1, self._count):
+            self._t[k - 1] = self._t[k] - t1
+            self._x[k - 1] = self._x[k] - x1
+        self._count -= 1
+        seconds = self._origin_seconds + t1
+        self._origin_days += seconds//_SECONDS_PER_DAY
+        self._origin_seconds = seconds%_SECONDS_PER_DAY
+        local_us = self._origin_local_us + x1
+        self._origin_local_s += t1 + local_us//SECOND_US
+        self._origin_local_us = local_us%SECOND_US
+
+    def _fit(self):
+        # least squares on u = t/half - 1 in -1 ... 1, so that single precision floats are enough
+        n = self._count
+        half = self._t[n - 1]/2
+        quadratic = self._t[n - 1] >= DRIFT_QUADRATIC_SPAN_S and n >= 8
+        s1 = s2 = s3 = s4 = y0 = y1 = y2 = 0.0
+        for k in range(n):
+            u = self._t[k]/half - 1
+            y = self._x[k]
+            u2 = u*u
+            s1 += u
+            s2 += u2
+            s3 += u2*u
+            s4 += u2*u2
+            y0 += y
+            y1 += y*u
+            y2 += y*u2
+        if quadratic:
+            # inverse of the symmetric normal matrix [[n, s1, s2], [s1, s2, s3], [s2, s3, s4]]
+            i00 = s2*s4 - s3*s3
+            i01 = s2*s3 - s1*s4
+            i02 = s1*s3 - s2*s2
+            i11 = n*s4 - s2*s2
+            i12 = s1*s2 - n*s3
+            i22 = n*s2 - s1*s1
+            det = n*i00 + s1*i01 + s2*i02
+            a = (i00*y0 + i01*y1 + i02*y2)/det
+            b = (i01*y0 + i11*y1 + i12*y2)/det
+            c = (i02*y0 + i12*y1 + i22*y2)/det
+            parameters = 3
+        else:
+            det = n*s2 - s1*s1
+            b = (n*y1 - s1*y0)/det
+            a = (y0 - b*s1)/n
+            c = 0.0
+            i11 = n
+            i12 = i22 = 0.0
+            parameters = 2
+        residuals = 0.0
+        for k in range(n):
+            u = self._t[k]/half - 1
+            r = self._x[k] - a - (b + c*u)*u
+            residuals += r*r
+        variance = residuals/(n - parameters) if n > parameters else 0.0
+        if variance < DRIFT_MIN_JITTER_US*DRIFT_MIN_JITTER_US:
+            variance = DRIFT_MIN_JITTER_US*DRIFT_MIN_JITTER_US
+        # at the last sample u = 1: frequency (b + 2c)/half us per second, drift rate 2c/half**2 per second
+        frequency = 1000*(b + 2*c)/half
+        if not -DRIFT_MAX_PPB < frequency < DRIFT_MAX_PPB:
+            return
+        self.frequency_ppb = int(frequency)
+        self.frequency_error_ppb = _clamp(1000*(variance*(i11 + 4*i12 + 4*i22)/det)**0.5/half, _DRIFT_LIMIT_PPB)
+        if quadratic:
+            self.drift_ppb_per_hour = _clamp(3600000*2*c/(half*half), _DRIFT_LIMIT_PPB)
+            self.drift_error_ppb_per_hour = _clamp(3600000*2*(variance*i22/det)**0.5/(half*half), _DRIFT_LIMIT_PPB)
+        else:
+            self.drift_ppb_per_hour = 0
+            self.drift_error_ppb_per_hour = DRIFT_DEFAULT_PPB_PER_HOUR
+        self.estimates += 1
+
+    def holdover_error_us(self, phase_us):
+        """
+        estimated error of the local clock since the last second mark: phase_us at the mark, plus
+        the uncertainties of the frequency offset and of the drift rate integrated since then
+        """
+        elapsed_s = self._local_s - self._mark_local_s
+        error = (phase_us + self.frequency_error_ppb*elapsed_s/1000
+                 + self.drift_error_ppb_per_hour*elapsed_s*elapsed_s/7200000)
+        return int(error) if error < _ERROR_LIMIT_US else _ERROR_LIMIT_US
+
+    def get_status(self):
+        # format: (frequency offset ppb, drift rate ppb per hour, frequency error ppb, samples in the window)
+        return (self.frequency_ppb, self.drift_ppb_per_hour, self.frequency_error_ppb, self._count)
+
+
+def _clamp(value, limit):
+    value = int(value)
+    return limit if value > limit else -limit if value < -limit else value
@@ -0,0 +1,211 @@
+"""
+Host-side audio front end: DCF77 edge events from a WAV recording of the WebSDR tone (NumPy).
+
+Software version of the analogue chain (microphone, envelope circuit, GPIO), processed in
+chunks so that files of any length stream through with a bounded memory:
+- FIR band-pass filter around the tone (windowed sinc, history kept between chunks),
+- full-wave rectification,
+- moving-average smoothing,
+- hysteresis thresholds relative to the running peak of the envelope.
+The output is the edge event stream consumed by pulse_replay and batch_decode: (level, duration_ms),
+level 1 while the tone is reduced (the 100 ms / 200 ms DCF77 pulses), as on the GPIO.
+
+usage : python audio_frontend.py recording.wav [--tone HZ] [--bandwidth HZ] [--taps N]
+                                  [--smoothing MS] [--capture capture.txt]
+        python audio_frontend.py --synthesize capture.txt recording.wav [--tone HZ] [--noise RMS]
+                                  [--rate HZ] [--pm]
+"""
+import argparse, sys, time, wave
+
+import numpy as np
+
+TONE_HZ = 800          # WebSDR beat tone
+BANDWIDTH_HZ = 200
+FIR_TAPS = 255
+SMOOTHING_MS = 10
+LOW_THRESHOLD = 0.35   # tone reduced below LOW_THRESHOLD x peak ...
+HIGH_THRESHOLD = 0.55  # ... and present again above HIGH_THRESHOLD x peak
+PEAK_DECAY_S = 5.0     # time constant of the running peak
+CHUNK_SAMPLES = 4096
+
+
+def bandpass_taps(rate, low_hz, high_hz, taps=FIR_TAPS):
+    """ linear-phase FIR band-pass: difference of two windowed sinc low-pass filters """
+    n = np.arange(taps) - (taps - 1)/2
+    lowpass = lambda cutoff: 2*cutoff/rate*np.sinc(2*cutoff/rate*n)
+    h = (lowpass(high_hz) - lowpass(low_hz))*np.hamming(taps)
+    # unity gain at the centre frequency
+    centre = (low_hz + high_hz)/2
+    return h/abs(np.sum(h*np.exp(-2j*np.pi*centre/rate*np.arange(taps))))
+
+
+class StreamingFIR():
+    """ FIR filter applied chunk by chunk, the last taps-1 input samples are kept between chunks """
+    def __init__(self, taps):
+        self.taps = np.asarray(taps, dtype=np.float64)
+        self._history = np.zeros(self.taps.size - 1)
+
+    def process(self, samples):
+        buffer = np.concatenate((self._history, samples))
+        self._history = buffer[samples.size:]
+        return np.convolve(buffer, self.taps, mode="valid")
+
+
+class MovingAverage():
+    """ moving average over width samples, chunk by chunk (running sum, O(1) per sample) """
+    def __init__(self, width):
+        self.width = width
+        self._history = np.zeros(width)
+
+    def process(self, samples):
+        buffer = np.concatenate((self._history, samples))
+        self._history = buffer[samples.size:]
+        sums = np.cumsum(buffer)
+        return (sums[self.width:] - sums[:-self.width])/self.width
+
+
+class EnvelopeDetector():
+    """
+    audio chunks in, (level, duration_ms) edge events out.
+    delay_ms is the constant group delay of the filters: edges are reported that late,
+    durations are not affected.
+    """
+    def __init__(self, rate, tone=TONE_HZ, bandwidth=BANDWIDTH_HZ, taps=FIR_TAPS,
+                 smoothing_ms=SMOOTHING_MS, low=LOW_THRESHOLD, high=HIGH_THRESHOLD):
+        self.rate = rate
+        self._bandpass = StreamingFIR(bandpass_taps(rate, tone - bandwidth/2, tone + bandwidth/2, taps))
+        width = max(1, rate*smoothing_ms//1000)
+        self._smoother = MovingAverage(width)
+        self.delay_ms = ((taps - 1)/2 + (width - 1)/2)*1000/rate
+        self._settling = taps - 1 + width - 1 # filter outputs not meaningful yet
+        self._low = low
+        self._high = high
+        self._peak = 0.0
+        self._peak_decay = np.exp(-1/(PEAK_DECAY_S*rate))
+        self._level = 0          # current output level
+        self._samples = 0        # samples processed so far
+        self._last_edge_ms = 0
+
+    def process(self, samples):
+        """ process one chunk, returns the list of the segments completed in this chunk """
+        envelope = self._smoother.process(np.abs(self._bandpass.process(samples)))
+        self._peak = max(self._peak*self._peak_decay**samples.size, envelope.max(initial=0.0))
+        # hysteresis: 1 below the low threshold, 0 above the high one, unchanged in between
+        decided = np.full(envelope.size, -1, dtype=np.int8)
+        decided[envelope > self._high*self._peak] = 0
+        decided[envelope < self._low*self._peak] = 1
+        decided[:max(0, self._settling - self._samples)] = -1
+        last = np.where(decided >= 0, np.arange(envelope.size), -1)
+        np.maximum.accumulate(last, out=last)
+        levels = np.where(last >= 0, decided[last], self._level)
+        edges = np.flatnonzero(np.diff(levels, prepend=self._level))
+        events = []
+        for edge in (self._samples + edges).tolist():
+            edge_ms = edge*1000//self.rate
+            events.append((self._level, edge_ms - self._last_edge_ms))
+            self._level ^= 1
+            self._last_edge_ms = edge_ms
+        self._samples += samples.size
+        return events
+
+    def flush(self):
+        """ the segment in progress at the end of the recording """
+        return (self._level, self._samples*1000//self.rate - self._last_edge_ms)
+
+
+def read_wav(path, chunk=CHUNK_SAMPLES, mono=True):
+    """ (sample rate, generator of float chunks in [-1, 1]), mono or (samples x channels) """
+    recording = wave.open(path, "rb")
+    rate = recording.getframerate()
+    width = recording.getsampwidth()
+    channels = recording.getnchannels()
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    scale = float(1 << (8*width - 1))
+    def chunks():
+        with recording:
+            while True:
+                frames = recording.readframes(chunk)
+                if not frames:
+                    return
+                samples = np.frombuffer(frames, dtype=dtype).astype(np.float64)
+                if width == 1:
+                    samples -= 128
+                samples = samples.reshape(-1, channels)/scale
+                yield samples.mean(axis=1) if mono else samples
+    return rate, chunks()
+
+
+def wav_events(path, **detector_options):
+    """ all the edge events of a WAV recording """
+    rate, chunks = read_wav(path)
+    detector = EnvelopeDetector(rate, **detector_options)
+    events = []
+    for samples in chunks:
+        events.extend(detector.process(samples))
+    events.append(detector.flush())
+    return events
+
+
+def synthesize_wav(events, path, rate=8000, tone=TONE_HZ, reduction=0.15, noise=0.05, seed=0,
+                   phase_modulation=False):
+    """
+    WAV recording of the tone keyed by edge events, DCF77 style: amplitude reduced while level is 1.
+    With phase_modulation, each second (starting at each level 1 segment) also carries the
+    pseudo-random phase modulation of pm_correlator, inverted for a 200 ms pulse (bit 1).
+    """
+    rng = np.random.default_rng(seed)
+    lengths = np.array([duration*rate//1000 for _, duration in events], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    amplitude = np.repeat([reduction if level else 1.0 for level, _ in events], lengths)
+    phase = np.zeros(amplitude.size)
+    if phase_modulation:
+        from pm_correlator import pm_phase
+        for (level, duration), start in zip(events, starts.tolist()):
+            if level:
+                pm_phase(phase, start, rate, duration > 150)
+    t = np.arange(amplitude.size)/rate
+    samples = amplitude*0.5*np.sin(2*np.pi*tone*t + phase) + rng.normal(0, noise, amplitude.size)
+    with wave.open(path, "wb") as recording:
+        recording.setnchannels(1)
+        recording.setsampwidth(2)
+        recording.setframerate(rate)
+        recording.writeframes((np.clip(samples, -1, 1)*32767).astype("<i2").tobytes())
+
+
+def write_capture(events, path):
+    with open(path, "w") as capture:
+        for level, duration in events:
+            capture.write(f"{level} {duration}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DCF77 edge events from a WebSDR audio recording")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--tone", type=float, default=TONE_HZ)
+    parser.add_argument("--bandwidth", type=float, default=BANDWIDTH_HZ)
+    parser.add_argument("--taps", type=int, default=FIR_TAPS)
+    parser.add_argument("--smoothing", type=int, default=SMOOTHING_MS)
+    parser.add_argument("--capture", help="write the edge events to this capture file")
+    parser.add_argument("--synthesize", action="store_true", help="capture.txt to recording.wav")
+    parser.add_argument("--noise", type=float, default=0.05)
+    parser.add_argument("--rate", type=int, default=8000, help="sample rate of --synthesize")
+    parser.add_argument("--pm", action="store_true", help="--synthesize with the phase modulation")
+    args = parser.parse_args()
+    if args.synthesize:
+        from pulse_replay import load_capture
+        synthesize_wav(load_capture(args.paths[0]), args.paths[1], rate=args.rate, tone=args.tone,
+                       noise=args.noise, phase_modulation=args.pm)
+        sys.exit()
+    start = time.perf_counter()
+    events = wav_events(args.paths[0], tone=args.tone, bandwidth=args.bandwidth, taps=args.taps,
+                        smoothing_ms=args.smoothing)
+    elapsed = time.perf_counter() - start
+    if args.capture:
+        write_capture(events, args.capture)
+    import batch_decode
+    minutes = batch_decode.decode(np.array([level for level, _ in events], dtype=np.uint8),
+                                  np.array([duration for _, duration in events], dtype=np.int64))
+    audio_s = sum(duration for _, duration in events)/1000
+    good = np.count_nonzero(minutes["status"] == batch_decode.FRAME_OK)
+    print(f"{len(events)} edges, {minutes.size} frames, {good} valid")
+    print(f"{audio_s:.0f} s of audio processed in {elapsed:.2f} s ({audio_s/elapsed:.0f}x real time)")
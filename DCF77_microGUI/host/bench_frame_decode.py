@@ -0,0 +1,124 @@
+"""
+Host benchmark: string-based frame decoding (historical implementation) versus the
+bit-packed integer decoding of DCF77_frame.
+
+Both paths are timed whole, from the received symbols to the fields: the string path
+appends each symbol to the frame string as the historical _push did, the integer path ORs
+each bit into the frame words as DCF_Decoder._push does. The decoding alone, and the
+per-frame pack_frame loop that the incremental packing replaces, are reported too.
+
+usage : python bench_frame_decode.py [number_of_frames]
+"""
+import random, sys, timeit
+
+import hostenv
+hostenv.install()
+from DCF77.DCF77_frame import *
+
+
+######################### reference: string path
+def string_BCD_decoder(string):
+    BCD_weight = [1, 2, 4, 8, 10, 20, 40, 80]
+    value = 0
+    for k in range(len(string)):
+        value += BCD_weight[k]*int(string[k])
+    return value
+
+def string_frame_parity_is_valid(frame):
+    s0 = (frame[0]  == "0")
+    s1 = (frame[20] == "1")
+    p1 = (frame[21:29].count("1")%2 == 0)
+    p2 = (frame[29:36].count("1")%2 == 0)
+    p3 = (frame[36:59].count("1")%2 == 0)
+    return (s0 and s1 and p1 and p2 and p3)
+
+def string_decode(frame):
+    if not string_frame_parity_is_valid(frame):
+        return None
+    return (string_BCD_decoder(frame[50:58]), string_BCD_decoder(frame[45:50]),
+            string_BCD_decoder(frame[36:42]), string_BCD_decoder(frame[42:45]),
+            string_BCD_decoder(frame[29:35]), string_BCD_decoder(frame[21:28]),
+            string_BCD_decoder(frame[17:19]))
+
+
+def string_receive(bits):
+    frame = ""
+    for bit in bits:
+        frame += "1" if bit else "0"
+    return frame + "#"
+
+
+######################### integer path
+def integer_receive(bits, words):
+    # as DCF_Decoder._push: each bit ORed into its word when it arrives
+    words[0] = 0
+    words[1] = 0
+    for index in range(FRAME_BITS):
+        if bits[index] == 1:
+            if index < HI_WORD_FIRST_BIT:
+                words[0] |= 1 << index
+            else:
+                words[1] |= 1 << (index - HI_WORD_FIRST_BIT)
+    return words
+
+def integer_decode(words):
+    if not frame_parity_is_valid(words):
+        return None
+    return (field_value(words, YEAR), field_value(words, MONTH),
+            field_value(words, DAY), field_value(words, WEEK_DAY),
+            field_value(words, HOURS), field_value(words, MINUTES),
+            field_value(words, ZONE))
+
+
+######################### test frames
+def random_frame(rng):
+    bits = bytearray(rng.getrandbits(1) for _ in range(59))
+    bits[0] = 0
+    bits[20] = 1
+    # fix the parity bits of 3 frames out of 4 so that both branches are exercised
+    if rng.random() < 0.75:
+        bits[28] = sum(bits[21:28]) & 1
+        bits[35] = sum(bits[29:35]) & 1
+        bits[58] = sum(bits[36:58]) & 1
+    return bits
+
+
+def main(count):
+    rng = random.Random(77)
+    frames = [random_frame(rng) for _ in range(count)]
+    strings = ["".join(str(b) for b in bits) + "#" for bits in frames]
+    packed = []
+    for bits in frames:
+        words = [0, 0]
+        pack_frame(bits, words)
+        packed.append(words)
+
+    for s, words in zip(strings, packed):
+        assert string_decode(s) == integer_decode(words), s
+
+    for bits, s, words in zip(frames, strings, packed):
+        assert string_receive(bits) == s
+        assert integer_receive(bits, [0, 0]) == words
+
+    words = [0, 0]
+
+    def timed(function):
+        return min(timeit.repeat(function, number=1, repeat=5))/count*1e6
+    decode_string = timed(lambda: [string_decode(s) for s in strings])
+    decode_integer = timed(lambda: [integer_decode(w) for w in packed])
+    receive_string = timed(lambda: [string_receive(bits) for bits in frames])
+    receive_integer = timed(lambda: [integer_receive(bits, words) for bits in frames])
+    pack = timed(lambda: [pack_frame(bits, words) for bits in frames])
+    print(f"frames decoded          : {count}")
+    print(f"string decode           : {decode_string:7.2f} us/frame")
+    print(f"integer decode          : {decode_integer:7.2f} us/frame   speedup {decode_string/decode_integer:5.2f}")
+    print(f"pack_frame (per frame)  : {pack:7.2f} us/frame")
+    print(f"string path, whole      : {receive_string + decode_string:7.2f} us/frame   (symbols appended + decode)")
+    print(f"integer path, whole     : {receive_integer + decode_integer:7.2f} us/frame   (bits ORed + decode)   "
+          f"speedup {(receive_string + decode_string)/(receive_integer + decode_integer):5.2f}")
+    print(f"at the minute marker    : {decode_string:7.2f} us string, {decode_integer:7.2f} us integer "
+          f"(the bits are already packed)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
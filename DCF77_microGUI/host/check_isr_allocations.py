@@ -0,0 +1,70 @@
+"""
+Host check: the DCF_Decoder edge path (IRQ handler and edge processing) must not allocate on the heap.
+
+Bits are pushed through _DCF_clock_IRQ_handler and _process_edges while tracemalloc is running; any
+allocation, even immediately freed, raises the traced peak above the baseline.
+CPython boxes every int above 256 whereas MicroPython small ints (< 2**30) are not heap
+objects, so the peak may show a few transient int boxes: it must stay within
+INT_BOX_ALLOWANCE and must not depend on the number of bits, and nothing may be retained.
+"""
+import sys, tracemalloc
+
+import hostenv
+hostenv.install()
+import utime
+from DCF77.decoder_uGUIv1 import *
+from DCF77.local_time_calendar_uGUI import LocalTimeCalendar
+
+
+class EdgeEvent():
+    def __init__(self, is_pressed, last_event_duration):
+        self.is_pressed = is_pressed
+        self.last_event_duration = last_event_duration
+        self.duration_us = last_event_duration*1000
+
+
+def minute_of_edges():
+    edges = []
+    for second in range(59):
+        high = 200 if second % 3 else 100
+        edges.append(EdgeEvent(False, high))
+        low = 1000 - high if second < 58 else 2000 - high
+        edges.append(EdgeEvent(True, low))
+    return edges
+
+
+INT_BOX_ALLOWANCE = 32*32 # bytes
+
+
+def traced_run(minutes):
+    decoder = DCF_Decoder(7, LocalTimeCalendar())
+    edges = minute_of_edges()*minutes
+    handler = decoder._DCF_clock_IRQ_handler
+    process = decoder._process_edges
+    advance = utime.advance_us
+    for edge in edges[:240]: # warm up: first frame, lazy attributes
+        advance(edge.duration_us)
+        handler(edge)
+        process()
+    iterator = iter(edges[240:])
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for edge in iterator:
+        advance(edge.duration_us)
+        handler(edge)
+        process()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    bits = (len(edges) - 240)//2
+    print(f"{bits:7d} bits: retained {current - baseline} B, peak {peak - baseline} B")
+    return current - baseline, peak - baseline
+
+
+if __name__ == "__main__":
+    short_retained, short_peak = traced_run(60)
+    long_retained, long_peak = traced_run(24*60)
+    ok = (long_retained == short_retained and long_peak == short_peak
+          and long_peak <= INT_BOX_ALLOWANCE)
+    print("no heap allocation per bit in the edge path" if ok else "edge path ALLOCATES")
+    sys.exit(0 if ok else 1)
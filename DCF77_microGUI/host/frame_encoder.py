@@ -0,0 +1,140 @@
+"""
+Host-side DCF77 transmitter: frames and edge timings for any date, from the encoder of DCF77_frame.
+
+The frame sent during a minute carries the local time (CET or CEST) of the next minute.
+The time zone follows the European rule (summer time from the last Sunday of March to the
+last Sunday of October, 01:00 UTC); A1 is sent during the hour before a change, A2 during
+the hour before a leap second, and the minute of a leap second lasts 61 s.
+The fields are advanced with next_minute and only recomputed from the date every hour, so
+that a year of minutes is encoded in seconds.
+
+usage : python frame_encoder.py [--start YYYY-MM-DDTHH:MM] [--minutes N] > capture.txt  (UTC start)
+        python frame_encoder.py --roundtrip [--start ...] [--minutes N]
+--roundtrip encodes every minute (a year by default), decodes it with frame_parity_is_valid
+and decode_fields, and checks that the fields and the edge timings come back unchanged.
+"""
+import argparse, sys, time
+from datetime import datetime, timedelta
+
+import hostenv
+hostenv.install()
+from DCF77.DCF77_frame import *
+
+MINUTE = timedelta(minutes=1)
+HOUR = timedelta(hours=1)
+# the minute (UTC) that ends with a leap second
+LEAP_MINUTES = (datetime(2015, 6, 30, 23, 59), datetime(2016, 12, 31, 23, 59))
+
+
+def _last_sunday(year, month):
+    day = datetime(year, month + 1, 1) - timedelta(days=1) if month < 12 else datetime(year, 12, 31)
+    return day - timedelta(days=(day.weekday() + 1)%7)
+
+def zone_at(utc):
+    """ CET or CEST at the UTC datetime utc """
+    start = _last_sunday(utc.year, 3).replace(hour=1)
+    end = _last_sunday(utc.year, 10).replace(hour=1)
+    return CEST if start <= utc < end else CET
+
+def datetime_fields(utc):
+    """ the DCF77_frame fields of the local time at the UTC datetime utc """
+    zone = zone_at(utc)
+    local = utc + (2*HOUR if zone == CEST else HOUR)
+    return [zone, local.minute, local.hour, local.day, local.isoweekday(), local.month, local.year%100]
+
+def frame_flags(utc, leap_minutes=LEAP_MINUTES):
+    """ A1 and A2 of the frame sent during the minute that starts at utc """
+    flags = 0
+    if zone_at(utc) != zone_at(utc + HOUR):
+        flags |= ANNOUNCEMENT_MASK
+    for leap in leap_minutes:
+        if utc <= leap < utc + HOUR:
+            flags |= LEAP_SECOND_MASK
+    return flags
+
+
+def minute_frames(start, minutes, leap_minutes=LEAP_MINUTES):
+    """
+    one (utc, words, leap_second) per minute from the UTC minute start: the words sent
+    during the minute that starts at utc, leap_second if that minute lasts 61 s
+    """
+    leap_minutes = set(leap_minutes)
+    utc = start.replace(second=0, microsecond=0)
+    fields = None
+    flags = 0
+    for _ in range(minutes):
+        if fields is None or utc.minute == 0 or fields[MINUTES] == 0:
+            # time zone changes, announcements and leap seconds only happen on the hour
+            fields = datetime_fields(utc + MINUTE)
+            flags = frame_flags(utc, leap_minutes)
+        words = [0, 0]
+        encode_frame(fields, words, flags)
+        yield utc, words, utc in leap_minutes
+        next_minute(fields)
+        utc += MINUTE
+
+def minute_events(words, leap_second=False, pulses=None):
+    """ the capture events [(level, duration_ms), ...] of one minute, from its first pulse """
+    pulses = bytearray(LEAP_MINUTE_SECONDS) if pulses is None else pulses
+    events = []
+    for pulse in pulses[:frame_pulses(words, pulses, leap_second)]:
+        if pulse:
+            events.append((1, pulse))
+            events.append((0, 1000 - pulse))
+        else:
+            events[-1] = (0, events[-1][1] + 1000)
+    return events
+
+def capture_events(start, minutes, leap_minutes=LEAP_MINUTES):
+    """ the signal of minutes minutes from the UTC minute start, capture format """
+    events = []
+    pulses = bytearray(LEAP_MINUTE_SECONDS)
+    for _, words, leap_second in minute_frames(start, minutes, leap_minutes):
+        events += minute_events(words, leap_second, pulses)
+    return events
+
+
+def roundtrip(start, minutes):
+    """ encode and decode every minute; returns (errors, minutes encoded per second, minutes checked per second) """
+    fields = [0]*FIELD_COUNT
+    pulses = bytearray(LEAP_MINUTE_SECONDS)
+    bits = bytearray(FRAME_BITS)
+    errors = 0
+    begin = time.perf_counter()
+    frames = list(minute_frames(start, minutes))
+    encoding = time.perf_counter() - begin
+    for utc, words, leap_second in frames:
+        decode_fields(words, fields)
+        unpack_frame(words, bits)
+        seconds = frame_pulses(words, pulses, leap_second)
+        checks = (
+            frame_parity_is_valid(words),
+            fields == datetime_fields(utc + MINUTE),
+            words[0] & (ANNOUNCEMENT_MASK | LEAP_SECOND_MASK) == frame_flags(utc),
+            seconds == (LEAP_MINUTE_SECONDS if leap_second else MINUTE_SECONDS),
+            all((pulses[k] == PULSE_1_MS) == bits[k] for k in range(FRAME_BITS)),
+            )
+        if not all(checks):
+            errors += 1
+            if errors <= 10:
+                print(f"{utc:%Y-%m-%d %H:%M} UTC: fields {fields}, checks {checks}")
+    # the checks use host-side helpers (datetime_fields, list compares): the round trip is much slower than encoding
+    return errors, minutes/encoding, minutes/(time.perf_counter() - begin)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DCF77 frames and edge timings from the date")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2016, 1, 1),
+                        help="UTC, 2016 has a leap day, a leap second and both summer time changes")
+    parser.add_argument("--minutes", type=int, default=None, help="default: 60, a year with --roundtrip")
+    parser.add_argument("--roundtrip", action="store_true")
+    args = parser.parse_args()
+    if args.roundtrip:
+        minutes = args.minutes or 366*24*60
+        errors, encode_rate, roundtrip_rate = roundtrip(args.start, minutes)
+        print(f"{minutes} minutes: encoding only {encode_rate:.0f} minutes/s, "
+              f"full round trip {roundtrip_rate:.0f} minutes/s, {errors} round-trip errors")
+        sys.exit(1 if errors else 0)
+    print(f"# {args.start:%Y-%m-%d %H:%M} UTC, {args.minutes or 60} minutes")
+    for level, duration in capture_events(args.start, args.minutes or 60):
+        print(level, duration)
@@ -0,0 +1,185 @@
+"""
+Host-side streaming tone detector: Goertzel filter bank on fixed-size audio blocks (NumPy).
+
+Low-latency alternative to the whole-file front end of audio_frontend: the audio is read in
+quarter blocks, and each quarter block gives the tone amplitude of the last block (largest
+output of a small bank of Goertzel bins around the tone, so that a slightly mistuned WebSDR
+still works): the windows overlap by three quarters. A hysteresis on that amplitude gives
+the edges. Each quarter block runs the Goertzel recurrence s[n] = x[n] + 2cos(w).s[n-1] - s[n-2]
+once per bin, and the DFT bin of a window is the sum of those of its four quarter blocks,
+rotated by the phase of their start: every sample goes through the recurrence once.
+
+The edge time is interpolated inside the window: with a phase-continuous tone, the bin
+amplitude is proportional to the part of the window where the tone is at each level.
+Each edge is reported at the end of the quarter block where it is decided, with its
+detection delay (report time - edge time), within one block: the hysteresis decides once
+60 % of the window is at the new level, at most a quarter block after it got there.
+report time - delay is the timestamp of the edge, as LocalTimeCalendar.second_mark wants it.
+
+usage : python goertzel_detector.py recording.wav [--block N] [--tone HZ]
+        python goertzel_detector.py --benchmark recording.wav
+a test recording can be made from a capture with audio_frontend.py --synthesize
+"""
+import argparse, cmath, sys, time
+
+import numpy as np
+
+from audio_frontend import TONE_HZ, read_wav
+
+BLOCK_SAMPLES = 256
+BANK_BINS = 3           # bins at tone - 1 bin width, tone, tone + 1 bin width
+THRESHOLDS = (0.4, 0.6) # hysteresis between the reduced level (0) and the full tone level (1)
+HOPS = 4               # windows per block: a new window every quarter block
+LEVEL_ALPHA = 0.05      # EWMA weight of the level estimates
+REDUCED_LEVEL = 0.15    # initial guess of the reduced tone level, relative to the full tone
+BENCHMARK_BLOCKS = (64, 128, 256, 512, 1024, 2048, 4096)
+SHORTEST_PULSE_MS = 100 # a "0" pulse must be able to fill enough of a window to be decided
+MAX_BLOCK_MS = SHORTEST_PULSE_MS/max(1 - THRESHOLDS[0], THRESHOLDS[1])
+
+
+class GoertzelDetector():
+    """
+    process(samples) takes exactly hop (block//HOPS) samples and returns the edges decided with
+    them: [(edge_us, level, delay_us), ...], level 1 while the tone is reduced, as on the GPIO.
+    Times are counted from the first sample.
+    """
+    def __init__(self, rate, block=BLOCK_SAMPLES, tone=TONE_HZ, bins=BANK_BINS):
+        if block*1000/rate > MAX_BLOCK_MS:
+            raise ValueError(f"{block} samples at {rate} Hz: blocks longer than {MAX_BLOCK_MS:.0f} ms "
+                             f"cannot resolve the {SHORTEST_PULSE_MS} ms pulses")
+        self.rate = rate
+        self.block = block
+        self.hop = block//HOPS
+        self.block_us = block*1000000/rate
+        self.hop_us = self.hop*1000000/rate
+        self.max_delay_us = self.block_us
+        spacing = rate/block
+        omegas = 2*np.pi*(tone + (np.arange(bins) - bins//2)*spacing)/rate
+        self._coefficients = (2*np.cos(omegas)).tolist()
+        self._omegas = omegas.tolist()
+        self._rotations = np.exp(-1j*omegas).tolist()
+        self._quarters = [[0j]*bins for _ in range(HOPS)] # DFT bins of the last quarter blocks
+        self._full = None           # tone amplitude, signal at level 0
+        self._reduced = None        # tone amplitude, signal at level 1
+        self._level = 0
+        self._hops = 0
+
+    def _goertzel(self, samples):
+        # DFT bins of a quarter block, one recurrence per bin; the phase is taken from the first
+        # sample, so that the bins of the quarter blocks of a window add up to the window bins
+        quarter = self._quarters[self._hops % HOPS]
+        start = self._hops*self.hop
+        for k, coefficient in enumerate(self._coefficients):
+            s1 = s2 = 0.0
+            for x in samples:
+                s1, s2 = x + coefficient*s1 - s2, s1
+            # Goertzel output s1 - exp(-jw).s2 = exp(jw.(hop - 1)).DFT of the quarter block
+            quarter[k] = (s1 - self._rotations[k]*s2)*cmath.exp(-1j*self._omegas[k]*(start + self.hop - 1))
+
+    def amplitude(self):
+        # window of the last HOPS quarter blocks
+        return max(abs(sum(quarter[k] for quarter in self._quarters))
+                   for k in range(len(self._coefficients)))*2/self.block
+
+    def process(self, samples):
+        self._goertzel(samples.tolist())
+        self._hops += 1
+        if self._hops < HOPS:
+            return [] # the first window is not full yet
+        amplitude = self.amplitude()
+        if self._full is None:
+            self._full = amplitude
+            self._reduced = REDUCED_LEVEL*amplitude
+        full, reduced = self._full, self._reduced
+        span = max(full - reduced, 1e-12)
+        # part of the window at the level opposite to the current one
+        if self._level == 0:
+            new = (full - amplitude)/span
+            decided = amplitude < reduced + THRESHOLDS[0]*span
+        else:
+            new = (amplitude - reduced)/span
+            decided = amplitude > reduced + THRESHOLDS[1]*span
+        new = min(1.0, max(0.0, new))
+        end_us = self._hops*self.hop_us
+        edges = []
+        if decided:
+            # the edge is inside the window: the previous one, a quarter block earlier, was not decided
+            delay_us = new*self.block_us
+            self._level ^= 1
+            edges.append((end_us - delay_us, self._level, delay_us))
+        else:
+            # level estimates from the windows that are clearly inside a segment
+            if new < 1 - THRESHOLDS[1]:
+                if self._level == 0:
+                    self._full += LEVEL_ALPHA*(amplitude - full)
+                else:
+                    self._reduced += LEVEL_ALPHA*(amplitude - reduced)
+        return edges
+
+
+def wav_edges(path, block=BLOCK_SAMPLES, tone=TONE_HZ):
+    """ all the edges of a WAV recording, and the recording duration in s """
+    rate, chunks = read_wav(path, block//HOPS)
+    detector = GoertzelDetector(rate, block, tone)
+    edges = []
+    samples = 0
+    for chunk in chunks:
+        samples += chunk.size
+        if chunk.size == detector.hop:
+            edges.extend(detector.process(chunk))
+    return edges, samples/rate
+
+
+def replay_edges(edges):
+    """ the edges through DCF_Decoder, timestamped report time - detection delay """
+    from pulse_replay import PulseReplay
+    replay = PulseReplay()
+    for edge_us, level, delay_us in edges:
+        report_us = int(edge_us + delay_us)
+        replay.feed_edge(level, report_us - int(delay_us), report_us)
+    return replay
+
+
+def benchmark(path):
+    print(f"{'block':>6s} {'block ms':>9s} {'x real time':>12s} {'core %':>7s} {'max delay ms':>13s} {'frames':>7s}")
+    rate = read_wav(path)[0]
+    for block in BENCHMARK_BLOCKS:
+        if block*1000/rate > MAX_BLOCK_MS:
+            print(f"{block:>6d} {block*1000/rate:>9.1f}   too coarse for the {SHORTEST_PULSE_MS} ms pulses")
+            continue
+        start = time.perf_counter()
+        edges, duration = wav_edges(path, block)
+        elapsed = time.perf_counter() - start
+        max_delay = max((delay for _, _, delay in edges), default=0)/1000
+        frames = replay_edges(edges).frames
+        good = sum(1 for status, _ in frames if status[1] == SYNC)
+        print(f"{block:>6d} {block*1000/rate:>9.1f} {duration/elapsed:>12.0f} {100*elapsed/duration:>7.2f} "
+              f"{max_delay:>13.1f} {good:>3d}/{len(frames):<3d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="streaming Goertzel detector of the DCF77 WebSDR tone")
+    parser.add_argument("path")
+    parser.add_argument("--block", type=int, default=BLOCK_SAMPLES)
+    parser.add_argument("--tone", type=float, default=TONE_HZ)
+    parser.add_argument("--benchmark", action="store_true", help=f"block sizes {BENCHMARK_BLOCKS}")
+    args = parser.parse_args()
+    import hostenv
+    hostenv.install()
+    from DCF77.decoder_uGUIv1 import SYNC
+    if args.benchmark:
+        benchmark(args.path)
+        sys.exit()
+    start = time.perf_counter()
+    try:
+        edges, duration = wav_edges(args.path, args.block, args.tone)
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+    replay = replay_edges(edges)
+    delays = [delay for _, _, delay in edges]
+    good = sum(1 for status, _ in replay.frames if status[1] == SYNC)
+    print(f"{len(edges)} edges, {len(replay.frames)} frames, {good} valid")
+    print(f"detection delay: mean {np.mean(delays)/1000:.1f} ms, max {max(delays)/1000:.1f} ms "
+          f"(bound {args.block*1000/read_wav(args.path)[0]:.1f} ms)")
+    print(f"{duration:.0f} s of audio processed in {elapsed:.2f} s ({duration/elapsed:.0f}x real time)")
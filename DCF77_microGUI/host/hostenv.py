@@ -0,0 +1,30 @@
+"""
+Host (CPython) environment for the DCF77 modules.
+
+install() puts the MicroPython stand-in modules of host/stubs on sys.path, defines the
+const() builtin and maps the DCF77 package name used on the board to this directory tree,
+so that "from DCF77.xxx import ..." works unchanged on a PC.
+With trace=True, debug_utility.pulses is replaced by DCF77.trace_recorder: the D0 ... D7
+probes of every module record into the software trace ring.
+"""
+import builtins, os, sys, types
+
+HOST_DIR = os.path.dirname(os.path.abspath(__file__))
+STUBS_DIR = os.path.join(HOST_DIR, "stubs")
+PACKAGE_DIR = os.path.dirname(HOST_DIR)
+
+
+def install(trace=False):
+    if STUBS_DIR not in sys.path:
+        sys.path.insert(0, STUBS_DIR)
+    if not hasattr(builtins, "const"):
+        builtins.const = lambda value: value
+    if "DCF77" not in sys.modules:
+        package = types.ModuleType("DCF77")
+        package.__path__ = [PACKAGE_DIR]
+        sys.modules["DCF77"] = package
+    if trace:
+        import debug_utility
+        import DCF77.trace_recorder
+        sys.modules["debug_utility.pulses"] = DCF77.trace_recorder
+        debug_utility.pulses = DCF77.trace_recorder
@@ -0,0 +1,198 @@
+"""
+Host-side phase-modulation correlator: sub-millisecond DCF77 second marks from recordings (NumPy).
+
+Besides the 100 ms / 200 ms amplitude pulses, DCF77 phase-modulates its carrier every second
+with a pseudo-random sequence of 512 chips (+/- 15.6 degrees, 120 carrier cycles per chip,
+about 1.55 ms), starting 200 ms after the second mark. The sequence is sent as is for a "0"
+and inverted for a "1". Its sharp autocorrelation gives a far better timing than the edges
+of the amplitude pulses.
+
+Chips: 9-bit linear feedback shift register x^9 + x^5 + 1, all ones at start, 511 chips of
+the maximal-length sequence plus a final "0"; chip 0 advances the phase, chip 1 delays it.
+The audio of a lower side band receiver mirrors the phase: use --invert.
+
+Processing, offline on the whole recording:
+- audio: the tone is mixed down to complex baseband and low-pass filtered;
+  IQ (stereo WAV, I left, Q right): used as is, shifted by --offset,
+- instantaneous phase, unwrapped, minus its 50 ms moving average (frequency offset, drift),
+- FFT (overlap-add) correlation with the chip sequence,
+- the correlation peak of each second is tracked one second after the previous one and
+  refined by parabolic interpolation; its sign gives the bit.
+
+grade() compares other second marks to the correlator ones: with --grade, the amplitude
+edges of audio_frontend (minus their filter delay) are graded; local clock ticks recorded
+on the same time base can be graded the same way.
+
+usage : python pm_correlator.py recording.wav [--tone HZ] [--iq] [--offset HZ] [--invert] [--grade]
+"""
+import argparse
+
+import numpy as np
+
+from audio_frontend import TONE_HZ, read_wav
+
+CARRIER_HZ = 77500
+CHIP_S = 120/CARRIER_HZ
+CHIPS = 512
+PM_START_S = 0.2
+DEVIATION_RAD = np.radians(15.6)
+LOWPASS_HZ = 700        # chip rate is 646 Hz
+DETREND_S = 0.05
+SEARCH_S = 0.05         # second mark search window, around the previous one + 1 s
+MIN_QUALITY = 0.3       # weaker peaks are reported but not tracked
+FFT_BLOCK = 1 << 16
+
+MARK_DTYPE = np.dtype([
+    ("time_s", np.float64),  # second mark, from the start of the recording
+    ("bit", np.uint8),       # PM bit, same value as the amplitude bit
+    ("quality", np.float64), # correlation peak relative to a clean signal, about 1.0
+    ])
+
+
+def prn_chips():
+    """ the 512 chips of the DCF77 pseudo-random sequence, as 0/1 """
+    state = 0x1FF
+    chips = np.zeros(CHIPS, dtype=np.uint8)
+    for k in range(CHIPS - 1):
+        chips[k] = state & 1
+        feedback = (state ^ (state >> 4)) & 1
+        state = (state >> 1) | (feedback << 8)
+    return chips
+
+def chip_waveform(rate):
+    """ +1/-1 per sample over the 512 chips, chip boundaries rounded to the nearest sample """
+    signs = 1.0 - 2.0*prn_chips()
+    boundaries = np.round(np.arange(CHIPS + 1)*CHIP_S*rate).astype(np.int64)
+    return np.repeat(signs, np.diff(boundaries))
+
+def pm_phase(phase, start, rate, bit):
+    """ adds the phase modulation of a second that starts at sample start (synthesis) """
+    waveform = chip_waveform(rate)*DEVIATION_RAD*(-1 if bit else 1)
+    first = start + round(PM_START_S*rate)
+    last = min(phase.size, first + waveform.size)
+    if last > first:
+        phase[first:last] += waveform[:last - first]
+
+
+def fft_convolve(x, h, block=FFT_BLOCK):
+    """ full linear convolution, overlap-add with fixed-size FFTs """
+    size = 1 << int(np.ceil(np.log2(block + h.size - 1)))
+    H = np.fft.fft(h, size)
+    y = np.zeros(x.size + h.size - 1, dtype=np.result_type(x, h, np.complex128))
+    for start in range(0, x.size, block):
+        segment = x[start:start + block]
+        out = np.fft.ifft(np.fft.fft(segment, size)*H)[:segment.size + h.size - 1]
+        y[start:start + out.size] += out
+    return y if np.iscomplexobj(x) or np.iscomplexobj(h) else y.real
+
+def lowpass_taps(rate, cutoff, taps):
+    n = np.arange(taps) - (taps - 1)/2
+    h = 2*cutoff/rate*np.sinc(2*cutoff/rate*n)*np.hamming(taps)
+    return h/h.sum()
+
+def baseband(samples, rate, frequency):
+    """ complex baseband: samples shifted by -frequency, low-pass filtered, no delay """
+    z = samples*np.exp(-2j*np.pi*frequency*np.arange(samples.size)/rate)
+    taps = (rate//(LOWPASS_HZ//4)) | 1
+    h = lowpass_taps(rate, LOWPASS_HZ, taps)
+    return fft_convolve(z, h)[(taps - 1)//2:][:samples.size]
+
+def phase_deviation(z, rate):
+    """ instantaneous phase minus its moving average: the phase modulation and noise """
+    phase = np.unwrap(np.angle(z))
+    width = int(DETREND_S*rate) | 1
+    sums = np.cumsum(np.concatenate((np.zeros(1), phase)))
+    half = width//2
+    index = np.arange(phase.size)
+    low = np.maximum(index - half, 0)
+    high = np.minimum(index + half + 1, phase.size)
+    return phase - (sums[high] - sums[low])/(high - low)
+
+
+def correlate(deviation, rate):
+    """ c[k]: correlation of the chip sequence starting at sample k """
+    template = chip_waveform(rate)
+    full = fft_convolve(deviation, template[::-1])
+    return full[template.size - 1:deviation.size], template.size
+
+def _refine(c, magnitude, predicted, search):
+    # strongest peak around the predicted sample, parabolic interpolation
+    low = max(1, round(predicted) - search)
+    high = min(c.size - 1, round(predicted) + search + 1)
+    if high <= low:
+        return None
+    j = low + int(np.argmax(magnitude[low:high]))
+    a, b, g = magnitude[j - 1], magnitude[j], magnitude[j + 1]
+    denominator = a - 2*b + g
+    return j + (0.5*(a - g)/denominator if denominator else 0.0), c[j]
+
+def second_marks(deviation, rate, invert=False):
+    """ one MARK_DTYPE row per second found in the phase deviation """
+    c, length = correlate(deviation, rate)
+    if c.size < 3:
+        return np.zeros(0, dtype=MARK_DTYPE)
+    scale = length*DEVIATION_RAD
+    magnitude = np.abs(c)
+    search = int(SEARCH_S*rate)
+    # acquisition on the strongest peak, then tracking one second forwards and backwards;
+    # a weak peak does not move the tracking, the next second is searched around the prediction
+    anchor = float(np.argmax(magnitude))
+    marks = []
+    for step in (rate, -rate):
+        predicted = anchor if step > 0 else anchor + step
+        while True:
+            found = _refine(c, magnitude, predicted, search)
+            if found is None:
+                break
+            position, value = found
+            quality = abs(value)/scale
+            marks.append((position/rate - PM_START_S, (value < 0) != invert, quality))
+            predicted = (position if quality >= MIN_QUALITY else predicted) + step
+    marks.sort()
+    return np.array(marks, dtype=MARK_DTYPE)
+
+
+def wav_marks(path, tone=TONE_HZ, iq=False, offset=0.0, invert=False):
+    rate, chunks = read_wav(path, mono=not iq)
+    samples = np.concatenate(list(chunks))
+    if iq:
+        z = baseband(samples[:, 0] + 1j*samples[:, 1], rate, offset)
+    else:
+        z = baseband(samples, rate, tone)
+    return second_marks(phase_deviation(z, rate), rate, invert)
+
+
+def grade(marks_s, reference_s, window_s=0.1):
+    """ (count, mean, standard deviation, max abs) in ms of marks - nearest reference mark """
+    reference_s = np.sort(reference_s)
+    index = np.clip(np.searchsorted(reference_s, marks_s), 1, max(1, reference_s.size - 1))
+    candidates = np.stack((reference_s[index - 1], reference_s[np.minimum(index, reference_s.size - 1)]))
+    nearest = candidates[np.argmin(np.abs(candidates - marks_s), axis=0), np.arange(marks_s.size)]
+    errors = (marks_s - nearest)[np.abs(marks_s - nearest) < window_s]*1000
+    if errors.size == 0:
+        return (0, 0.0, 0.0, 0.0)
+    return (errors.size, errors.mean(), errors.std(), np.abs(errors).max())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DCF77 phase-modulation correlator")
+    parser.add_argument("path")
+    parser.add_argument("--tone", type=float, default=TONE_HZ)
+    parser.add_argument("--iq", action="store_true", help="stereo I/Q recording")
+    parser.add_argument("--offset", type=float, default=0.0, help="carrier frequency in the I/Q recording")
+    parser.add_argument("--invert", action="store_true", help="lower side band audio")
+    parser.add_argument("--grade", action="store_true", help="grade the amplitude edges of audio_frontend")
+    args = parser.parse_args()
+    marks = wav_marks(args.path, args.tone, args.iq, args.offset, args.invert)
+    good = marks[marks["quality"] > 0.5]
+    print(f"{marks.size} second marks, {good.size} with quality > 0.5")
+    if good.size:
+        print("bits: " + "".join(str(bit) for bit in good["bit"][:60].tolist()) + ("..." if good.size > 60 else ""))
+    if args.grade and not args.iq:
+        from audio_frontend import EnvelopeDetector, wav_events
+        events = wav_events(args.path, tone=args.tone)
+        times = np.cumsum([duration for _, duration in events])/1000
+        rising = times[[level == 0 for level, _ in events]] # end of a level 0 segment
+        delay_s = EnvelopeDetector(read_wav(args.path)[0], tone=args.tone).delay_ms/1000
+        count, mean, std, worst = grade(rising - delay_s, good["time_s"])
+        print(f"amplitude edges - PM marks: {count} marks, mean {mean:+.2f} ms, std {std:.2f} ms, max {worst:.2f} ms")
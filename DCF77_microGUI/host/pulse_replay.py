@@ -0,0 +1,115 @@
+"""
+Host-side pulse replay engine for DCF_Decoder.
+
+Recorded edge events are fed to the decoder through the host stand-in of the GPIO button,
+so they go through the same IRQ handler, frame buffer and frame decoding as on the board.
+The replay is not throttled: virtual time only advances with the recorded durations.
+
+Capture format: one event per line, "level duration_ms" (space or comma separated),
+meaning that the signal stayed at level (0 or 1) for duration_ms, then toggled.
+Lines starting with "#" are comments.
+
+usage : python pulse_replay.py capture.txt
+"""
+import argparse, time
+
+import hostenv
+hostenv.install()
+from DCF77.decoder_uGUIv1 import *
+from DCF77.local_time_calendar_uGUI import LocalTimeCalendar
+import utime
+
+SIGNAL_TIMEOUT_MS = 2000 # same timeout as DCF_Decoder.DCF_signal_monitoring
+TONE_GPIO = 7
+
+
+def load_capture(path):
+    events = []
+    with open(path) as capture:
+        for line in capture:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            level, duration = line.replace(",", " ").split()[:2]
+            events.append((int(level), int(duration)))
+    return events
+
+
+class PulseReplay():
+    """
+    tick_phase_ms: phase of the local one-second timer relative to the start of the replay,
+    the local calendar is advanced at each virtual second as machine.Timer(freq=1) would do
+    """
+    def __init__(self, decoder=None, local_time=None, tick_phase_ms=500):
+        if decoder is None:
+            local_time = LocalTimeCalendar() if local_time is None else local_time
+            decoder = DCF_Decoder(TONE_GPIO, local_time)
+        self.decoder = decoder
+        self.local_time = decoder._local_time
+        self._button = decoder._signal_in
+        self.frames = [] # one entry per minute marker: (time_status, raw_time_and_date)
+        self.edges = 0
+        self._next_tick_us = utime.now_us() + tick_phase_ms*1000
+        self._last_edge_us = utime.now_us()
+
+    def feed(self, level, duration):
+        # DCF_signal_monitoring: one timeout every 2 s without any edge
+        for _ in range(duration // SIGNAL_TIMEOUT_MS):
+            self.decoder._status_controller.signal_timeout()
+        end_us = utime.now_us() + duration*1000
+        self._run_ticks(end_us)
+        utime.set_us(end_us)
+        self._button.inject(level, duration)
+        self.edges += 1
+        self._process()
+
+    def feed_edge(self, level, edge_us, report_us):
+        """
+        one edge from a software detector: the signal toggled to level at edge_us, the detector
+        reported it at report_us; the edge is timestamped report_us - detection delay, i.e. edge_us
+        """
+        for _ in range((edge_us - self._last_edge_us) // (SIGNAL_TIMEOUT_MS*1000)):
+            self.decoder._status_controller.signal_timeout()
+        self._last_edge_us = edge_us
+        self._run_ticks(report_us)
+        utime.set_us(edge_us)
+        self._button.inject_edge(level)
+        utime.set_us(report_us)
+        self.edges += 1
+        self._process()
+
+    def _run_ticks(self, end_us):
+        while self._next_tick_us <= end_us:
+            utime.set_us(self._next_tick_us)
+            self.local_time.next_second()
+            self._next_tick_us += 1000000
+
+    def _process(self):
+        self.decoder._DCF_clock_received.clear()
+        self.decoder._edge_received()
+        if self.decoder._DCF_frame_received.state:
+            self.decoder._DCF_frame_received.clear()
+            self.decoder._decode_frame()
+            self.frames.append((self.decoder.get_time_status(), tuple(self.local_time.get_raw_time_and_date())))
+
+    def run(self, events):
+        for level, duration in events:
+            self.feed(level, duration)
+        return self.frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay a pulse capture through DCF_Decoder")
+    parser.add_argument("capture", help='one "level duration_ms" event per line')
+    args = parser.parse_args()
+    events = load_capture(args.capture)
+    replay = PulseReplay()
+    start = time.perf_counter()
+    frames = replay.run(events)
+    elapsed = time.perf_counter() - start
+    signal_ms = sum(duration for _, duration in events)
+    for time_status, t in frames:
+        print(f"{TIME_STATE_NAMES[time_status[1]]:<16s} {TIME_EVENT_NAMES[time_status[0]]:<20s} {t[0]:4d}-{t[1]:02d}-{t[2]:02d} {t[3]:02d}:{t[4]:02d} UTC{t[7]:+d} {time_status[2]}")
+    good = sum(1 for time_status, _ in frames if time_status[1] == SYNC)
+    print(f"{len(events)} edges, {len(frames)} frames, {good} valid")
+    print(f"{signal_ms/1000:.0f} s of signal replayed in {elapsed:.3f} s ({signal_ms/1000/elapsed:.0f}x real time)")
@@ -0,0 +1,239 @@
+"""
+Host-side synthetic DCF77 signal with fault injection, and time-to-sync benchmark.
+
+The clean signal comes from frame_encoder (the DCF77_frame encoder): one minute per frame,
+pulse at level 1 (100 ms "0", 200 ms "1"), no pulse at second 59. It starts at a random point of a minute, then faults are added with a seeded RNG:
+- jitter: every edge moved by a gaussian error,
+- drops: pulses lost, the second stays at level 0,
+- glitches: a short segment at the opposite level inside a segment (some shorter
+  than the debounce delay of the button, some longer),
+- bursts: a few seconds of random toggles (noise),
+- outages: a long period without any edge.
+The events have the capture format of pulse_replay, [(level, duration_ms), ...].
+
+The benchmark runs each noise profile through simulator.Simulation (DCF_device as deployed,
+in virtual time) and reports percentiles of the time to the first SYNC and of the time to
+get back to SYNC after a loss. Judge decoder changes on these numbers.
+
+usage : python signal_generator.py [--profile NAME] [--minutes N] [--seed S] > capture.txt
+        python signal_generator.py --benchmark [--runs N] [--minutes N] [--seed S] [--profile NAME ...] [--sources N]
+--source K writes receive chain K of the same signal (own faults and latency), --sources N
+benchmarks DCF_Decoder in fusion mode on N receive chains
+"""
+import argparse, random, sys
+from datetime import datetime
+
+from frame_encoder import capture_events
+
+# first frame 2024-02-28 23:50 CET: a leap day and a change of day, month and week day within minutes
+START_UTC = datetime(2024, 2, 28, 22, 49)
+SECOND_MS = 1000
+# receive chains of the fusion benchmark: latency of each chain, and independent faults
+SOURCE_LATENCIES_MS = (0, 150, 60, 230)
+SOURCE_SEED_STEP = 1000003
+
+
+class FaultProfile():
+    """
+    jitter_ms: standard deviation of the edge times
+    drop_rate, glitch_rate: probability per pulse, per segment
+    burst_rate, outage_rate: probability per minute, durations drawn in burst_s, outage_s
+    """
+    def __init__(self, jitter_ms=0, drop_rate=0.0, glitch_rate=0.0, glitch_ms=(10, 120),
+                 burst_rate=0.0, burst_s=(2, 15), outage_rate=0.0, outage_s=(30, 600)):
+        self.jitter_ms = jitter_ms
+        self.drop_rate = drop_rate
+        self.glitch_rate = glitch_rate
+        self.glitch_ms = glitch_ms
+        self.burst_rate = burst_rate
+        self.burst_s = burst_s
+        self.outage_rate = outage_rate
+        self.outage_s = outage_s
+
+PROFILES = {
+    "clean": FaultProfile(),
+    "jitter": FaultProfile(jitter_ms=15),
+    "drops": FaultProfile(drop_rate=0.02),
+    "glitches": FaultProfile(glitch_rate=0.03),
+    "bursts": FaultProfile(burst_rate=0.1),
+    "outages": FaultProfile(outage_rate=0.05),
+    "mixed": FaultProfile(jitter_ms=8, drop_rate=0.01, glitch_rate=0.01, burst_rate=0.05, outage_rate=0.02),
+    }
+
+
+def _merge(events):
+    # consecutive segments at the same level are one segment
+    merged = []
+    for level, duration in events:
+        if duration <= 0:
+            continue
+        if merged and merged[-1][0] == level:
+            merged[-1] = (level, merged[-1][1] + duration)
+        else:
+            merged.append((level, duration))
+    return merged
+
+def _jitter(events, sigma_ms, rng):
+    edges = []
+    t = 0
+    for _, duration in events:
+        t += duration
+        edges.append(t)
+    jittered = []
+    previous = 0
+    for k, edge in enumerate(edges):
+        # the last edge is kept, so the signal length does not change
+        edge = edge if k == len(edges) - 1 else round(edge + rng.gauss(0, sigma_ms))
+        edge = max(edge, previous + 1)
+        jittered.append((events[k][0], edge - previous))
+        previous = edge
+    return jittered
+
+def _drops_and_glitches(events, profile, rng):
+    faulty = []
+    for level, duration in events:
+        if level == 1 and rng.random() < profile.drop_rate:
+            level = 0
+        if rng.random() < profile.glitch_rate and duration > profile.glitch_ms[1] + 20:
+            glitch = rng.randint(*profile.glitch_ms)
+            start = rng.randint(10, duration - glitch - 10)
+            faulty += [(level, start), (1 - level, glitch), (level, duration - start - glitch)]
+        else:
+            faulty.append((level, duration))
+    return faulty
+
+def _windows(profile, total_ms, rng):
+    # bursts and outages: [(start_ms, end_ms, kind), ...], sorted, not overlapping
+    windows = []
+    for minute_ms in range(0, total_ms, 60*SECOND_MS):
+        for kind, rate, (low, high) in (("burst", profile.burst_rate, profile.burst_s),
+                                        ("outage", profile.outage_rate, profile.outage_s)):
+            if rng.random() < rate:
+                start = minute_ms + rng.randrange(60*SECOND_MS)
+                windows.append((start, min(total_ms, start + round(rng.uniform(low, high)*SECOND_MS)), kind))
+    windows.sort()
+    kept = []
+    for window in windows:
+        if window[0] < total_ms and (not kept or window[0] >= kept[-1][1]):
+            kept.append(window)
+    return kept
+
+def _window_events(kind, duration, rng):
+    if kind == "outage":
+        return [(0, duration)]
+    events = []
+    level = rng.randint(0, 1)
+    while duration > 0:
+        segment = min(duration, rng.randint(5, 80))
+        events.append((level, segment))
+        duration -= segment
+        level = 1 - level
+    return events
+
+def _overlay(events, windows, rng):
+    # the parts of the signal inside the windows are replaced by the window events
+    overlaid = []
+    w = 0
+    start = 0
+    for level, duration in events:
+        end = start + duration
+        t = start
+        while t < end:
+            if w < len(windows) and windows[w][0] <= t:
+                window_start, window_end, kind = windows[w]
+                if t == window_start:
+                    overlaid.extend(_window_events(kind, window_end - window_start, rng))
+                t = min(end, window_end)
+                if window_end <= end:
+                    w += 1
+            else:
+                stop = min(end, windows[w][0]) if w < len(windows) else end
+                overlaid.append((level, stop - t))
+                t = stop
+        start = end
+    return overlaid
+
+def generate(profile, minutes, seed, start=START_UTC, source=0):
+    """
+    minutes of signal with the faults of profile, starting at a random point of the first minute;
+    source > 0: another receive chain of the same signal, with its own faults and latency
+    """
+    rng = random.Random(seed)
+    events = capture_events(start, minutes + 1)
+    # random start: the first segments of the first minute are cut, and the signal ends minutes later
+    skip = rng.randrange(60*SECOND_MS)
+    first = 0
+    while skip >= events[first][1]:
+        skip -= events[first][1]
+        first += 1
+    events = [(events[first][0], events[first][1] - skip)] + events[first + 1:]
+    remaining = minutes*60*SECOND_MS
+    for last, (level, duration) in enumerate(events):
+        if duration >= remaining:
+            events[last:] = [(level, remaining)]
+            break
+        remaining -= duration
+    if source:
+        rng = random.Random(seed + SOURCE_SEED_STEP*source)
+        events[0] = (events[0][0], events[0][1] + SOURCE_LATENCIES_MS[source%len(SOURCE_LATENCIES_MS)])
+    if profile.jitter_ms:
+        events = _jitter(events, profile.jitter_ms, rng)
+    events = _drops_and_glitches(events, profile, rng)
+    total_ms = sum(duration for _, duration in events)
+    windows = _windows(profile, total_ms, rng)
+    return _merge(_overlay(events, windows, rng))
+
+
+def percentiles(values, ranks=(50, 90, 99)):
+    """ nearest-rank percentiles, None without values """
+    values = sorted(values)
+    if not values:
+        return [None]*(len(ranks) + 1)
+    return [values[min(len(values) - 1, (len(values)*rank - 1)//100)] for rank in ranks] + [values[-1]]
+
+def benchmark(names, runs, minutes, seed, sources=1):
+    from simulator import Simulation
+    def seconds(values):
+        return " ".join(f"{value/1e6:7.1f}" if value is not None else "      -" for value in values)
+    print(f"{'profile':<12s} {'never':>5s} | {'first SYNC s: p50     p90     p99     max':>41s} | "
+          f"{'resyncs':>7s} | {'resync s: p50     p90     p99     max':>37s} | {'SYNC %':>6s}")
+    for name in names:
+        first, resyncs, in_sync, total = [], [], 0, 0
+        never = 0
+        for run in range(runs):
+            if sources > 1:
+                events = tuple(generate(PROFILES[name], minutes, seed + run, source=k) for k in range(sources))
+            else:
+                events = generate(PROFILES[name], minutes, seed + run)
+            simulation = Simulation(events)
+            simulation.run()
+            periods = simulation.sync_periods()
+            if not periods:
+                never += 1
+                continue
+            first.append(periods[0][0])
+            resyncs += [back - lost for (_, lost), (back, _) in zip(periods, periods[1:])]
+            in_sync += sum(end - start for start, end in periods)
+            total += simulation.signal_end_us - simulation.start_us
+        label = name if sources == 1 else f"{name} x{sources}"
+        print(f"{label:<12s} {never:>5d} | {seconds(percentiles(first)):>41s} | {len(resyncs):>7d} | "
+              f"{seconds(percentiles(resyncs)):>37s} | {100*in_sync/total if total else 0:>6.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DCF77 signal generator with fault injection")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES))
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--benchmark", action="store_true", help="time-to-sync percentiles per profile")
+    parser.add_argument("--runs", type=int, default=20, help="benchmark runs per profile")
+    parser.add_argument("--sources", type=int, default=1, help="benchmark receive chains, fusion mode if > 1")
+    parser.add_argument("--source", type=int, default=0, help="receive chain of the capture")
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.profile or list(PROFILES), args.runs, args.minutes, args.seed, args.sources)
+        sys.exit()
+    profile = (args.profile or ["mixed"])[0]
+    print(f"# {profile} profile, seed {args.seed}, {args.minutes} minutes, source {args.source}")
+    for level, duration in generate(PROFILES[profile], args.minutes, args.seed, source=args.source):
+        print(level, duration)
@@ -0,0 +1,248 @@
+"""
+Host-side discrete-event simulator of the whole DCF77 clock application.
+
+DCF_device runs as deployed: the decoder coroutines (DCF_signal_monitoring, frame_decoder),
+the phase-locked SecondTicker on machine.Timer, the one-second coroutine that advances
+LocalTimeCalendar and the status controller with its subscribers. Only the time is simulated:
+- VirtualTimeLoop is an asyncio event loop whose clock is utime.now_us(); when every task
+  waits, the loop jumps straight to the next timer instead of sleeping, so sleep_ms,
+  wait_for_ms, Event and ThreadSafeFlag all run in virtual time,
+- machine.Timer callbacks are scheduled on that loop (machine.set_timer_scheduler),
+- the recorded signal is injected into the GPIO button stand-in, one event at the end
+  of each of its segments, as the pin IRQ would do.
+A run is reproducible and a simulated day takes a few seconds.
+
+usage : python simulator.py capture.txt [capture2.txt ...] [--tail S] [--oscillator PPM[,PPM_PER_HOUR]] [--verbose]
+several captures: one receive chain each, DCF_Decoder in fusion mode
+--tail S keeps the clock running S seconds after the end of the capture (signal lost, holdover)
+--oscillator gives the board crystal a frequency error (utime.set_oscillator): with --tail, the
+holdover error of the local clock is compared with its estimate
+"""
+import argparse, asyncio, math, selectors, sys, time
+
+import hostenv
+hostenv.install()
+import machine, utime
+import uasyncio
+from DCF77.DCF77_device import DCF_device, TIME_STATE_TEXT
+from DCF77.decoder_uGUIv1 import SYNC
+from pulse_replay import TONE_GPIO, load_capture
+
+
+class _VirtualSelector(selectors.BaseSelector):
+    """ no file descriptor is ever ready: select(timeout) only moves the virtual time forward """
+    def __init__(self):
+        self._map = {}
+
+    def register(self, fileobj, events, data=None):
+        fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+        key = selectors.SelectorKey(fileobj, fd, events, data)
+        self._map[fileobj] = key
+        return key
+
+    def unregister(self, fileobj):
+        return self._map.pop(fileobj)
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("simulation deadlock: every task waits and no timer is pending")
+        # timeout is a float difference of float times: round up, but not on its last bits
+        utime.advance_us(max(0, math.ceil(timeout*1000000 - 0.001)))
+        return []
+
+    def get_map(self):
+        return self._map
+
+    def close(self):
+        self._map.clear()
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    """ asyncio event loop on the virtual utime clock """
+    def __init__(self):
+        super().__init__(_VirtualSelector())
+
+    def time(self):
+        return utime.now_us()/1000000
+
+    def call_at_us(self, due_us, callback, *args):
+        return self.call_at(due_us/1000000, callback, *args)
+
+
+class Simulation():
+    """
+    events: capture events [(level, duration_ms), ...], injected from the current virtual time,
+    or a tuple of captures: one receive chain each, the decoder runs in fusion mode.
+    transitions: one entry per status notification of DCF_device,
+    (time_us from the start, time_state, bit_rank, last_bit)
+    """
+    def __init__(self, events, verbose=False):
+        self.loop = VirtualTimeLoop()
+        asyncio.set_event_loop(self.loop)
+        machine.set_timer_scheduler(self.loop.call_at_us)
+        self.start_us = utime.now_us()
+        captures = events if isinstance(events, tuple) else (events,)
+        self.device = DCF_device(tuple(TONE_GPIO + k for k in range(len(captures))))
+        decoder = self.device.dcf_decoder
+        buttons = [decoder._signal_in] if decoder._sources is None else [source.signal_in for source in decoder._sources]
+        # per source: [button, events iterator, end of the current segment in us]
+        self._streams = [[button, iter(capture), self.start_us] for button, capture in zip(buttons, captures)]
+        self.signal_end_us = self.start_us + 1000*max(sum(duration for _, duration in capture) for capture in captures)
+        self.verbose = verbose
+        self.transitions = []
+        self.ticks = 0
+        self.phase_errors = [] # (time_us from the start, phase error in us, locked), at each tick
+        self.clock_offsets = [] # at each tick: true time - local time (UTC) in us, None before the first sync
+        self._tick_flag = uasyncio.ThreadSafeFlag()
+        self.device.subscribe(self._status_changed)
+
+    def _status_changed(self, snapshot):
+        elapsed_us = utime.now_us() - self.start_us
+        if self.transitions and self.transitions[-1][1] != snapshot[0] and self.verbose:
+            print(f"{elapsed_us/1e6:10.3f} s  {TIME_STATE_TEXT[snapshot[0]]}")
+        self.transitions.append((elapsed_us, snapshot[0], snapshot[2], snapshot[3]))
+
+    def _inject(self, stream, level, duration):
+        # end of a segment of the signal: the pin IRQ of the button fires now
+        stream[0].inject(level, duration)
+        self._schedule_next_event(stream)
+
+    def _schedule_next_event(self, stream):
+        event = next(stream[1], None)
+        if event is not None:
+            stream[2] += event[1]*1000
+            self.loop.call_at_us(stream[2], self._inject, stream, *event)
+
+    def _timer_IRQ(self, timer):
+        self._tick_flag.set()
+
+    async def _time_trigger(self):
+        # the one-second coroutine of DCF77_device.__main__, without the prints
+        while True:
+            await self._tick_flag.wait()
+            self.device.next_second()
+            self.ticks += 1
+            phase_error = self.device.get_phase_error()
+            self.phase_errors.append((utime.now_us() - self.start_us, phase_error[0], phase_error[1]))
+            self.clock_offsets.append(self._clock_offset())
+
+    def _clock_offset(self):
+        calendar = self.device.local_time
+        if not calendar.time_is_valid:
+            return None
+        utc_seconds = calendar._days*86400 + calendar._seconds - 3600*calendar.time_zone
+        return utime.now_us() - 1000000*utc_seconds
+
+    def tick_phase_errors(self):
+        """
+        [(time_us from the start, tick phase in us), ...] at each tick of the signal while the time is
+        valid: true time of the tick against the true second boundaries, the receive latency (the
+        median clock offset) removed
+        """
+        end_us = self.signal_end_us - self.start_us
+        phases = [(elapsed_us, offset) for (elapsed_us, _, _), offset in zip(self.phase_errors, self.clock_offsets)
+                  if offset is not None and elapsed_us <= end_us]
+        if not phases:
+            return []
+        median = sorted(offset for _, offset in phases)[len(phases)//2]
+        return [(elapsed_us, offset - median) for elapsed_us, offset in phases]
+
+    def holdover_errors(self, reference_s=600):
+        """
+        [(time_us from the start, clock error in us), ...] at each tick after the end of the signal;
+        the error is taken against the median clock offset of the locked ticks of its last reference_s
+        """
+        end_us = self.signal_end_us - self.start_us
+        reference = sorted(offset for (elapsed_us, _, locked), offset in zip(self.phase_errors, self.clock_offsets)
+                           if locked and offset is not None and end_us - 1000000*reference_s < elapsed_us <= end_us)
+        if not reference:
+            return []
+        median = reference[len(reference)//2]
+        return [(elapsed_us, median - offset) for (elapsed_us, _, _), offset in zip(self.phase_errors, self.clock_offsets)
+                if elapsed_us > end_us and offset is not None]
+
+    def run(self, tail_s=0):
+        """ runs until the end of the signal plus tail_s seconds, returns the wall-clock time in s """
+        decoder = self.device.dcf_decoder
+        self.device.start_second_ticker(self._timer_IRQ)
+        tasks = [self.loop.create_task(coroutine) for coroutine in
+                 (decoder.DCF_signal_monitoring(), decoder.frame_decoder(), self._time_trigger())]
+        for stream in self._streams:
+            self._schedule_next_event(stream)
+        start = time.perf_counter()
+        duration_s = (self.signal_end_us - utime.now_us())/1000000 + tail_s
+        self.loop.run_until_complete(uasyncio.sleep(duration_s))
+        elapsed = time.perf_counter() - start
+        # CPython wait_for may swallow a cancellation that comes with its result: cancel again
+        pending = tasks
+        while pending:
+            for task in pending:
+                task.cancel()
+            _, pending = self.loop.run_until_complete(asyncio.wait(pending, timeout=0.001))
+        failed = [task for task in tasks if not task.cancelled() and task.exception() is not None]
+        machine.set_timer_scheduler(None)
+        self.loop.close()
+        if failed:
+            # a coroutine of the application died: the rest of the run is meaningless
+            raise failed[0].exception()
+        return elapsed
+
+    def sync_periods(self):
+        """ [(start_us, end_us), ...] from the start, while the time state was SYNC """
+        periods = []
+        start_us = None
+        for elapsed_us, time_state, _, _ in self.transitions:
+            if time_state == SYNC and start_us is None:
+                start_us = elapsed_us
+            elif time_state != SYNC and start_us is not None:
+                periods.append((start_us, elapsed_us))
+                start_us = None
+        if start_us is not None:
+            periods.append((start_us, utime.now_us() - self.start_us))
+        return periods
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="discrete-event simulation of the DCF77 clock")
+    parser.add_argument("captures", nargs="+")
+    parser.add_argument("--tail", type=float, default=0, help="seconds simulated after the end of the capture")
+    parser.add_argument("--oscillator", default="0", help="crystal error: PPM[,PPM_PER_HOUR]")
+    parser.add_argument("--verbose", action="store_true", help="print each time state change")
+    args = parser.parse_args()
+    captures = [load_capture(path) for path in args.captures]
+    utime.set_oscillator(*(float(value) for value in args.oscillator.split(",")))
+    simulation = Simulation(tuple(captures) if len(captures) > 1 else captures[0], args.verbose)
+    elapsed = simulation.run(args.tail)
+    simulated_s = (utime.now_us() - simulation.start_us)/1000000
+    periods = simulation.sync_periods()
+    print(f"{simulated_s:.0f} s simulated in {elapsed:.2f} s ({simulated_s/elapsed:.0f}x real time), {simulation.ticks} ticks")
+    if not periods:
+        print("never in SYNC")
+        sys.exit(1)
+    print(f"first SYNC after {periods[0][0]/1e6:.1f} s, {len(periods)} SYNC periods, "
+          f"{sum(end - start for start, end in periods)/1e4/simulated_s:.1f} % of the time in SYNC")
+    for (_, lost), (back, _) in zip(periods[:10], periods[1:11]):
+        print(f"  SYNC lost at {lost/1e6:.1f} s, back after {(back - lost)/1e6:.1f} s")
+    if len(periods) > 11:
+        print("  ...")
+    phases = sorted(abs(phase) for _, phase in simulation.tick_phase_errors())
+    if phases:
+        signal = [is_locked for elapsed_us, _, is_locked in simulation.phase_errors
+                  if elapsed_us <= simulation.signal_end_us - simulation.start_us]
+        print(f"tick phase against true time: rms {math.sqrt(sum(phase*phase for phase in phases)/len(phases))/1000:.2f} ms, "
+              f"p95 {phases[len(phases)*95//100]/1000:.2f} ms, max {phases[-1]/1000:.2f} ms, "
+              f"locked {100*sum(signal)/len(signal):.0f} % of the ticks")
+    frequency_ppb, drift_ppb_per_hour, frequency_error_ppb, samples = simulation.device.get_drift_status()
+    print(f"oscillator: {frequency_ppb/1000:+.3f} ppm +/- {frequency_error_ppb/1000:.3f}, "
+          f"drift {drift_ppb_per_hour/1000:+.3f} ppm/h, {samples} samples")
+    holdover = simulation.holdover_errors()
+    if holdover:
+        worst = max(abs(error) for _, error in holdover)
+        print(f"holdover {holdover[-1][0]/1e6 - (simulation.signal_end_us - simulation.start_us)/1e6:.0f} s: "
+              f"clock error {holdover[-1][1]/1000:+.1f} ms (max {worst/1000:.1f} ms), "
+              f"estimated {simulation.device.get_holdover_error()/1000:.1f} ms")
+    t = simulation.device.get_local_time()
+    sources = simulation.device.dcf_decoder.get_source_status()
+    for k, (quality, offset_us, classified, rejected) in enumerate(sources or ()):
+        print(f"source {k}: quality {quality}, latency {offset_us/1000:+.1f} ms, {classified} bits, {rejected} rejected")
+    print(f"local time at the end: {t[0]:4d}-{t[1]:02d}-{t[2]:02d} {t[3]:02d}:{t[4]:02d}:{t[5]:02d} UTC{t[7]:+d}")
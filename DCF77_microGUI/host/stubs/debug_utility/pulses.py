@@ -0,0 +1,20 @@
+""" host stand-in for debug_utility.pulses : logic analyser probes do nothing on the host """
+
+class Probe():
+    def __init__(self, gpio):
+        self.gpio = gpio
+
+    def on(self):
+        pass
+
+    def off(self):
+        pass
+
+D0 = Probe(26)
+D1 = Probe(16)
+D2 = Probe(17)
+D3 = Probe(18)
+D4 = Probe(19)
+D5 = Probe(20)
+D6 = Probe(21)
+D7 = Probe(27)
@@ -0,0 +1,49 @@
+"""
+host stand-in for lib_pico.async_push_button.
+
+The button is driven by inject(level, duration) instead of a GPIO interrupt: the signal
+stayed at level for duration ms, then toggled. inject_edge(level) fires a single edge,
+for edge sources that do their own debouncing (software detectors). Segments shorter than debounce_delay are
+ignored, as the real button does. The caller advances the virtual time (utime) to the
+edge before calling inject().
+"""
+import utime
+
+
+class Button():
+    def __init__(self, name, pin_number, pull=-1, interrupt_service_routine=None,
+                 debounce_delay=50, active_HI=False, both_edge=True):
+        self.name = name
+        self.pin_number = pin_number
+        self._isr = interrupt_service_routine
+        self._debounce_delay = debounce_delay
+        self.is_pressed = False
+        self.last_event_duration = 0
+        self._elapsed = 0 # ms since the last accepted edge
+
+    def inject(self, level, duration):
+        level = bool(level)
+        self._elapsed += duration
+        if duration < self._debounce_delay:
+            return
+        if level != self.is_pressed:
+            # the edge that started this segment was hidden by a short glitch
+            utime.advance_us(-duration*1000)
+            self._edge(level, self._elapsed - duration)
+            utime.advance_us(duration*1000)
+            self._elapsed = duration
+        self._edge(not level, self._elapsed)
+        self._elapsed = 0
+
+    def inject_edge(self, level):
+        """ one edge to level at the current virtual time, already debounced """
+        level = bool(level)
+        if level != self.is_pressed:
+            self._edge(level, self._elapsed)
+            self._elapsed = 0
+
+    def _edge(self, new_level, duration):
+        self.is_pressed = new_level
+        self.last_event_duration = duration
+        if self._isr is not None:
+            self._isr(self)
@@ -0,0 +1,100 @@
+"""
+host stand-in for the MicroPython machine module (rp2 subset used by the DCF77 modules)
+
+Timers only fire once a scheduler is installed with set_timer_scheduler(schedule):
+schedule(due_us, callback) must call callback() at the virtual time due_us and return
+a handle with cancel() (the simulator uses its event loop). Without a scheduler, timers
+are inert, as the replay tools expect. Timer periods run on the local (crystal) time of
+utime.local_us(). Pin.drive(value) fires the Pin IRQ handler.
+"""
+import utime
+
+_timer_scheduler = None
+
+def set_timer_scheduler(schedule):
+    global _timer_scheduler
+    _timer_scheduler = schedule
+
+def disable_irq():
+    return 0
+
+def enable_irq(state):
+    pass
+
+
+class Pin():
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode=IN, pull=None, value=None):
+        self.id = id
+        self._value = 0 if value is None else value
+        self._handler = None
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def toggle(self):
+        self._value ^= 1
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._handler = handler
+        self._trigger = trigger
+
+    def drive(self, value):
+        """ the input changes to value now: the IRQ handler is called on a matching edge """
+        edge = self.IRQ_RISING if value and not self._value else self.IRQ_FALLING if self._value and not value else 0
+        self._value = value
+        if edge and self._handler is not None and self._trigger & edge:
+            self._handler(self)
+
+
+class Timer():
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, mode=PERIODIC, period=-1, tick_hz=1000, freq=-1, callback=None):
+        self._handle = None
+        self.init(mode=mode, period=period, tick_hz=tick_hz, freq=freq, callback=callback)
+
+    def init(self, mode=PERIODIC, period=-1, tick_hz=1000, freq=-1, callback=None):
+        self.deinit()
+        self.mode = mode
+        # period in us, as the rp2 port computes it
+        self.period_us = period*1000000 // tick_hz if freq <= 0 else round(1000000/freq)
+        self.callback = callback
+        if callback is not None and self.period_us > 0 and _timer_scheduler is not None:
+            self._schedule(utime.local_us() + self.period_us)
+
+    def deinit(self):
+        self.callback = None
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _schedule(self, due_us):
+        # due_us in local time, scheduled at the true time
+        self._due_us = due_us
+        self._handle = _timer_scheduler(utime.true_us(due_us), self._fire)
+
+    def _fire(self):
+        self._handle = None
+        callback = self.callback
+        if callback is None:
+            return
+        if self.mode == self.PERIODIC:
+            # next period from the due time, not from the callback time: no drift
+            self._schedule(self._due_us + self.period_us)
+        callback(self)
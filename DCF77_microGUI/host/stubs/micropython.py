@@ -0,0 +1,10 @@
+""" host stand-in for the MicroPython micropython module """
+
+def const(value):
+    return value
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+def schedule(function, argument):
+    function(argument)
@@ -0,0 +1,34 @@
+""" host stand-in for the MicroPython uasyncio module, based on CPython asyncio """
+from asyncio import *
+from asyncio import sleep, wait_for, TimeoutError
+
+
+def sleep_ms(ms):
+    return sleep(ms/1000)
+
+def wait_for_ms(awaitable, timeout):
+    return wait_for(awaitable, timeout/1000)
+
+
+class ThreadSafeFlag():
+    """ flag set from IRQ context; wait() returns once the flag is set and clears it """
+    def __init__(self):
+        self.state = False
+        self._event = None
+
+    def set(self):
+        self.state = True
+        if self._event is not None:
+            self._event.set()
+
+    def clear(self):
+        self.state = False
+        if self._event is not None:
+            self._event.clear()
+
+    async def wait(self):
+        if not self.state:
+            if self._event is None:
+                self._event = Event()
+            await self._event.wait()
+        self.clear()
@@ -0,0 +1,2 @@
+""" host stand-in for the MicroPython ustruct module """
+from struct import *
@@ -0,0 +1,82 @@
+"""
+host stand-in for the MicroPython utime module.
+
+Time is virtual: it only moves when advance_us() is called (or sleep_ms/sleep_us), so that
+recorded signals can be replayed as fast as the host can run.
+now_us() is the true (DCF77) time. set_oscillator() gives the board crystal a frequency error:
+the ticks_* functions and the machine.Timer schedule then run on the local time of local_us().
+"""
+import time as _time
+
+TICKS_PERIOD = 1 << 30
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+_now_us = 0
+_oscillator = None # (true us origin, ppm, ppm per hour)
+
+def now_us():
+    """ virtual time in microseconds, not wrapped """
+    return _now_us
+
+def advance_us(us):
+    global _now_us
+    _now_us += int(us)
+
+def set_us(us):
+    global _now_us
+    _now_us = int(us)
+
+def set_oscillator(ppm=0.0, ppm_per_hour=0.0):
+    """ from now on the local crystal is ppm fast, its error changing by ppm_per_hour """
+    global _oscillator
+    _oscillator = (_now_us, ppm, ppm_per_hour) if ppm or ppm_per_hour else None
+
+def local_us(true_us=None):
+    """ local (crystal) time at the true time true_us, now by default, not wrapped """
+    if true_us is None:
+        true_us = _now_us
+    if _oscillator is None:
+        return true_us
+    origin, ppm, ppm_per_hour = _oscillator
+    t = (true_us - origin)/1000000
+    return true_us + round(ppm*t + ppm_per_hour*t*t/7200)
+
+def true_us(local):
+    """ inverse of local_us """
+    if _oscillator is None:
+        return local
+    t = local
+    for _ in range(3):
+        t = local - (local_us(t) - t)
+    return t
+
+def ticks_us():
+    return local_us() & _TICKS_MAX
+
+def ticks_ms():
+    return (local_us() // 1000) & _TICKS_MAX
+
+def ticks_cpu():
+    return ticks_us()
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+def sleep_us(us):
+    advance_us(us)
+
+def sleep_ms(ms):
+    advance_us(ms*1000)
+
+def sleep(seconds):
+    advance_us(seconds*1000000)
+
+def time():
+    return int(_time.time())
+
+def localtime(secs=None):
+    return _time.localtime(secs)[:8]
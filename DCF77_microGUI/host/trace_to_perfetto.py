@@ -0,0 +1,98 @@
+"""
+Host tool: DCF77.trace_recorder binary dumps to Chrome/Perfetto trace JSON.
+
+Each probe becomes a track (thread) named after the section it brackets, on() starts and
+off() ends a slice; open the JSON in https://ui.perfetto.dev or chrome://tracing.
+ticks_us wraps at 2**30: the records are in time order, so the timestamps are unwrapped
+while reading.
+
+usage : python trace_to_perfetto.py trace.bin [trace.json]
+        python trace_to_perfetto.py --replay capture.txt [trace.json]
+--replay runs pulse_replay on a capture with all the probes traced against a wall clock,
+to profile the decoder sections on the host.
+"""
+import argparse, json, struct, time
+
+TICKS_PERIOD = 1 << 30
+HEADER = struct.Struct("<4sBBH")
+# what D0 ... D7 bracket in the DCF77 modules
+PROBE_NAMES = (
+    "D0 one second tick",
+    "D1 _DCF_clock_IRQ_handler",
+    "D2 frame_decoder",
+    "D3 aclock_screen / display",
+    "D4 signal_received",
+    "D5 signal_timeout",
+    "D6 time status SYNC",
+    "D7 display_signal_status",
+    )
+
+
+def read_dump(data):
+    """ [(probe_id, time_us, edge), ...] in time order, time unwrapped from the first record """
+    magic, version, _, count = HEADER.unpack_from(data)
+    if magic != b"DCFT":
+        raise ValueError("not a DCF77 trace dump")
+    ticks = struct.unpack_from(f"<{count}I", data, HEADER.size)
+    events = data[HEADER.size + 4*count:HEADER.size + 5*count]
+    records = []
+    offset = 0
+    previous = ticks[0] if count else 0
+    for tick, event in zip(ticks, events):
+        if tick < previous:
+            offset += TICKS_PERIOD
+        previous = tick
+        records.append((event >> 1, tick + offset - ticks[0], event & 1))
+    return records
+
+
+def to_trace_events(records, names=PROBE_NAMES):
+    """ Chrome trace events: one thread per probe, B/E slices """
+    trace = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "DCF77"}}]
+    for probe_id in sorted({probe_id for probe_id, _, _ in records}):
+        name = names[probe_id] if probe_id < len(names) else f"D{probe_id}"
+        trace.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": probe_id, "args": {"name": name}})
+    opened = set()
+    for probe_id, time_us, edge in records:
+        name = names[probe_id] if probe_id < len(names) else f"D{probe_id}"
+        if edge:
+            if probe_id in opened:
+                continue # on() twice: the ring kept only the second one, or a nested call
+            opened.add(probe_id)
+            trace.append({"name": name, "ph": "B", "pid": 1, "tid": probe_id, "ts": time_us})
+        elif probe_id in opened:
+            opened.discard(probe_id)
+            trace.append({"name": name, "ph": "E", "pid": 1, "tid": probe_id, "ts": time_us})
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def replay_dump(capture_path):
+    """ pulse_replay of a capture, every probe traced with a wall clock; returns the binary dump """
+    import io
+    import hostenv
+    hostenv.install(trace=True)
+    from DCF77.trace_recorder import recorder
+    from pulse_replay import PulseReplay, load_capture
+    recorder.clock = lambda: (time.perf_counter_ns()//1000) % TICKS_PERIOD
+    PulseReplay().run(load_capture(capture_path))
+    stream = io.BytesIO()
+    recorder.dump(stream)
+    return stream.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="trace_recorder dumps to Chrome/Perfetto trace JSON")
+    parser.add_argument("input", help="trace.bin, or capture.txt with --replay")
+    parser.add_argument("output", nargs="?", help="trace JSON (default: input with a .json extension)")
+    parser.add_argument("--replay", action="store_true", help="trace pulse_replay on a capture")
+    args = parser.parse_args()
+    if args.replay:
+        data = replay_dump(args.input)
+    else:
+        with open(args.input, "rb") as dump:
+            data = dump.read()
+    output = args.output or args.input.rsplit(".", 1)[0] + ".json"
+    records = read_dump(data)
+    with open(output, "w") as trace:
+        json.dump(to_trace_events(records), trace)
+    print(f"{len(records)} records, {records[-1][1]/1000 if records else 0:.1f} ms, written to {output}")
@@ -2,68 +2,274 @@ import uasyncio
 import ustruct, utime, machine
 from machine import Timer
 
+from DCF77.DCF77_frame import days_since_2000, DAYS_BEFORE_MONTH, SATURDAY
+from DCF77.drift_estimator import DriftEstimator
+
 import micropython
 micropython.alloc_emergency_exception_buf(100)
 
+SECOND_US = const(1000000)
+HALF_SECOND_US = const(500000)
+PHASE_LOCK_THRESHOLD_US = const(2000)
+PHASE_OUTLIER_US = const(50000)   # a second mark further than this from the tick is rejected ...
+PHASE_STEP_MARKS = const(5)       # ... unless this many in a row are: the phase is stepped
+PHASE_KP_SHIFT = const(5)         # PI loop filter gains: 1/32 of the phase error ...
+PHASE_KI_SHIFT = const(14)        # ... plus 1/16384 of their sum, per tick
+PHASE_INTEGRAL_LIMIT_US = const(1 << 27) # 8192 us per tick at most from the integral
+PHASE_AVERAGE_SHIFT = const(5)    # phase_error_us averages the last 32 marks
+SECONDS_PER_DAY = const(86400)
+DISCIPLINE_PERIOD_S = const(60)   # seconds between two updates of the tick period
+_TICK_HZ = const(1000000)         # machine.Timer periods in us
+
+
+class SecondTicker():
+    """
+    One-second tick, replacing machine.Timer(freq=1), phase-locked on the DCF77 second marks.
+    At each second mark, the phase error between the local tick and the mark is measured and fed
+    to a PI loop filter: the next tick period is shortened by error/2**PHASE_KP_SHIFT plus the sum
+    of the errors/2**PHASE_KI_SHIFT, so the tick follows the average of the marks, not each mark.
+    A mark further than PHASE_OUTLIER_US from the tick is rejected; the phase is only stepped to
+    the marks (the timer re-armed one second after the mark) on the first mark, and when
+    PHASE_STEP_MARKS marks in a row were rejected.
+    Between the marks (and through outages) the tick period is disciplined: discipline() sets it
+    in us from the estimated oscillator offset, the timer is only re-armed when it changes.
+    """
+    def __init__(self, callback):
+        self._callback = callback
+        self._one_shot = False
+        self.last_tick_us = utime.ticks_us()
+        self.phase_error_us = 0   # tick time - second mark time, averaged over the last marks
+        self.locked = False
+        self.rejected_marks = 0
+        self.period_us = SECOND_US    # local us per tick, disciplined
+        self._armed_period_us = SECOND_US
+        self._carry = 0               # correction left over by the rounding of the period, ppb x s
+        # PI loop filter
+        self._tracking = False        # False until the first mark, and after a phase step
+        self._integral_us = 0         # sum of the accepted phase errors
+        self._slew_us = 0             # correction of the next tick period, applied by _tick
+        self._outliers = 0            # marks rejected in a row
+        self._timer = Timer(mode=Timer.PERIODIC, period=SECOND_US, tick_hz=_TICK_HZ, callback=self._tick)
+
+    def _tick(self, timer):
+        self.last_tick_us = utime.ticks_us()
+        if self._slew_us:
+            # one period shortened by the loop filter, the periodic timer is re-armed at the next tick
+            self._timer.init(mode=Timer.ONE_SHOT, period=self.period_us - self._slew_us, tick_hz=_TICK_HZ, callback=self._tick)
+            self._slew_us = 0
+            self._one_shot = True
+        elif self._one_shot or self.period_us != self._armed_period_us:
+            self._one_shot = False
+            self._armed_period_us = self.period_us
+            self._timer.init(mode=Timer.PERIODIC, period=self.period_us, tick_hz=_TICK_HZ, callback=self._tick)
+        self._callback(timer)
+
+    def discipline(self, correction_ppb, seconds):
+        """ the local oscillator is correction_ppb fast for the next seconds ticks: tick period corrected """
+        # the period is in whole us: the fraction is carried over to the next call (sigma-delta),
+        # so that the timer is re-armed at most once per call
+        unit = 1000*seconds
+        target = correction_ppb*seconds + self._carry
+        correction_us = (target + unit//2)//unit
+        self._carry = target - correction_us*unit
+        self.period_us = SECOND_US + correction_us
+
+    def second_mark(self, mark_us):
+        """ mark_us : ticks_us timestamp of a DCF77 second mark, corrected for the known detection delay """
+        since_tick = utime.ticks_diff(mark_us, self.last_tick_us)
+        if since_tick < HALF_SECOND_US:
+            # the last tick belongs to this second mark
+            error = -since_tick
+            tick_now = False
+        else:
+            # the tick of this second mark is still to come
+            error = SECOND_US - since_tick
+            tick_now = True
+        if self._tracking:
+            if -PHASE_OUTLIER_US <= error <= PHASE_OUTLIER_US:
+                self._outliers = 0
+                self._integral_us = max(-PHASE_INTEGRAL_LIMIT_US, min(PHASE_INTEGRAL_LIMIT_US, self._integral_us + error))
+                self._slew_us = (error >> PHASE_KP_SHIFT) + (self._integral_us >> PHASE_KI_SHIFT)
+                self.phase_error_us += (error - self.phase_error_us) >> PHASE_AVERAGE_SHIFT
+                self.locked = -PHASE_LOCK_THRESHOLD_US <= self.phase_error_us <= PHASE_LOCK_THRESHOLD_US
+                return
+            # far from the tick: a wrong mark, unless the next ones are as far
+            self.rejected_marks += 1
+            self._outliers += 1
+            if self._outliers < PHASE_STEP_MARKS:
+                return
+        # first mark, or persistent phase error: the phase is stepped, the loop filter keeps its integral
+        self._tracking = True
+        self._outliers = 0
+        self._slew_us = 0
+        self.phase_error_us = 0
+        self.locked = False
+        if tick_now:
+            self.last_tick_us = utime.ticks_us()
+            self._callback(self._timer)
+        delay_us = SECOND_US - utime.ticks_diff(utime.ticks_us(), mark_us)
+        self._one_shot = True
+        self._timer.init(mode=Timer.ONE_SHOT, period=max(1, delay_us), tick_hz=_TICK_HZ, callback=self._tick)
+
+
 class LocalTimeCalendar():
     """
+    Local time kept as (days since 2000-01-01, second of the day) plus the time zone offset: the
+    one-second tick is a single increment, the day carry happens once a day. A single count of
+    seconds since 2000 would leave the MicroPython small integers (2**30) in 2034.
+    The broken-down fields (year ... second, week day) are computed when read, and cached:
+    the hour and minute once per minute, the date once per day. Leap years are those of
+    2000 ... 2099 (every 4 years), so the date stays right through long DCF77 outages.
     """
     def __init__(self):
         #init conversion tables
         self._time_zone_values = (0,2,1) #time_zone_code = 2 => CET => UTC+1, time_zone_code = 1 => CEST => UTC+2
         self.time_is_valid = False
-        #init local time        
-        self.year = 2000
-        self.month_num = 1   # in (1 ... 12)
-        self.mday = 1        # in (1 ... 31)
-        self.hour = 0        # in (0 ... 23)
-        self.minute = 0      # in (0 ... 59)
-        self.second = 0      # in (0 ... 59)
-        self.week_day_num = 1 # in (1 ... 7)
-        self.time_zone = 0   # UTC +{self.time_zone}
- 
+        #init local time
+        self._days = 0              # days since 2000-01-01, local date
+        self._seconds = 0           # second of the local day, 0 ... 86399
+        self.time_zone = 0          # UTC +{self.time_zone}
+        # cached fields, see _update_fields; format of get_raw_time_and_date
+        self._fields = [2000, 1, 1, 0, 0, 0, SATURDAY, 0, False]
+        self._fields_minute = 0     # minute of the day of the cached hour and minute
+        self._fields_days = 0       # day of the cached date
+        # second marks and phase lock
+        self._ticker = None
+        self._last_mark_us = None    # ticks_us of the last DCF77 second mark
+        self._last_second_us = 0     # ticks_us of the last next_second() call
+        self._absorb_tick = False
+        # oscillator drift and disciplined holdover
+        self._drift = DriftEstimator()
+        self._discipline_s = 0
+
+    def set_ticker(self, ticker):
+        self._ticker = ticker
+
+    def second_mark(self, mark_us):
+        self._last_mark_us = mark_us
+        self._drift.second_mark()
+        if self._ticker is not None:
+            self._ticker.second_mark(mark_us)
+
+    def get_phase_error(self):
+        # format: (phase error in us, locked), None without a phase-locked ticker
+        if self._ticker is None:
+            return None
+        return (self._ticker.phase_error_us, self._ticker.locked)
+
+    def get_holdover_error(self):
+        # estimated error of the local time in us, since the last DCF77 second mark; None before the first sync
+        if not self.time_is_valid:
+            return None
+        return self._drift.holdover_error_us(PHASE_LOCK_THRESHOLD_US)
+
+    def get_drift_status(self):
+        # format: (frequency offset ppb, drift rate ppb per hour, frequency error ppb, samples), local - DCF77
+        return self._drift.get_status()
+
+    def _update_fields(self):
+        fields = self._fields
+        minute = self._seconds//60
+        if minute != self._fields_minute:
+            self._fields_minute = minute
+            fields[3] = minute//60
+            fields[4] = minute%60
+        if self._days != self._fields_days:
+            self._fields_days = days = self._days
+            # 4-year cycles from 2000, a leap year first
+            year = 4*(days//1461)
+            day = days%1461
+            if day >= 366:
+                day -= 366
+                year += 1 + day//365
+                day %= 365
+                leap_day = 0
+            else:
+                leap_day = 1
+            month = 12
+            while DAYS_BEFORE_MONTH[month - 1] + (leap_day if month > 2 else 0) > day:
+                month -= 1
+            fields[0] = 2000 + year
+            fields[1] = month
+            fields[2] = day - DAYS_BEFORE_MONTH[month - 1] - (leap_day if month > 2 else 0) + 1
+            fields[6] = (days + SATURDAY - 1)%7 + 1
+        fields[5] = self._seconds%60
+        fields[7] = self.time_zone
+        fields[8] = self.time_is_valid
+        return fields
+
+    @property
+    def year(self):
+        return self._update_fields()[0]
+
+    @property
+    def month_num(self):
+        return self._update_fields()[1]
+
+    @property
+    def mday(self):
+        return self._update_fields()[2]
+
+    @property
+    def hour(self):
+        return self._update_fields()[3]
+
+    @property
+    def minute(self):
+        return self._update_fields()[4]
+
+    @property
+    def second(self):
+        return self._seconds%60
+
+    @property
+    def week_day_num(self):
+        return self._update_fields()[6]
+
     def get_raw_time_and_date(self):
 #FORMAT raw_time_and_date : t[0]:year, t[1]:month, t[2]:mday, t[3]:hour, t[4]:minute, t[5]:second, t[6]:weekday, t[7]:time_zone, t[8]:time_is_valid
-        clock_update = (self.year, self.month_num, self.mday, self.hour, self.minute, self.second, self.week_day_num, self.time_zone, self.time_is_valid)
-        return clock_update
+        # no allocation: the cached list is returned, read-only for the callers and updated in place
+        # every second and every minute, copy it (tuple()) to keep it
+        return self._update_fields()
 
-    def sync_time(self, DCF_time_pack):
+    def sync_time(self, DCF_time_pack, second=0):
         """
         When a DCF full correct frame is received, the decoder packs a set of bytes
         and this set is used to sync the local clock
         received pack : year, month_num, day, week_day_num, hours, minutes, time_zone_num
+        second is not 0 when the decoder resynchronises from a partial frame
         """
         (year, month, day, week_day, hours, minutes, time_zone_code) = ustruct.unpack("6HB",DCF_time_pack)
-        self.year = 2000+year
-        self.month_num = month
-        self.mday = day
-        self.week_day_num = week_day
-        self.hour = hours
-        self.minute = minutes
-        self.second = 0
+        # the week day follows from the date (checked against it by the decoder)
+        self._days = days_since_2000(year, month, day)
+        self._seconds = (60*hours + minutes)*60 + second
         self.time_zone = self._time_zone_values[time_zone_code]
         self.time_is_valid = True
+        # the tick of the current second mark may not have been processed yet: it must not
+        # increment the freshly synchronised second
+        if self._last_mark_us is not None:
+            self._absorb_tick = utime.ticks_diff(self._last_second_us, self._last_mark_us) < -HALF_SECOND_US
+            # a DCF77 minute boundary (or second of a fast resync): sample of the oscillator offset, in UTC
+            since_mark = utime.ticks_diff(utime.ticks_us(), self._last_mark_us)
+            if 0 <= since_mark < SECOND_US:
+                self._drift.minute_boundary(self._last_mark_us, self._days, self._seconds - 3600*self.time_zone)
 
-    def _next_hour(self):
-        if self.hour==23:
-            self.hour = 0
-        else:
-            self.hour +=1
-            
-    def _next_minute(self):
-        if self.minute==59:
-            self.minute = 0
-            self._next_hour()
-        else:
-            self.minute +=1
-            
     def next_second(self):
+        self._last_second_us = utime.ticks_us()
+        self._drift.local_tick(self._last_second_us)
+        self._discipline_s += 1
+        if self._discipline_s == DISCIPLINE_PERIOD_S:
+            self._discipline_s = 0
+            if self._ticker is not None:
+                self._ticker.discipline(self._drift.correction_ppb(), DISCIPLINE_PERIOD_S)
+        if self._absorb_tick:
+            self._absorb_tick = False
+            return
         # update time
-        if self.second == 59:
-            self.second = 0
-            self._next_minute()
-        else:
-            self.second +=1
+        self._seconds += 1
+        if self._seconds == SECONDS_PER_DAY:
+            self._seconds = 0
+            self._days += 1
                 
                 
                 
@@ -71,7 +277,7 @@ class LocalTimeCalendar():
 ###############################################################################                
 if __name__ == "__main__":
     print("test")
-    from random import randint
+    from DCF77.DCF77_frame import *
     from debug_utility.pulses import *
 # D0 = Probe(27) time_trigger
 # D1 = Probe(16) -
@@ -100,35 +306,28 @@ if __name__ == "__main__":
 
             
     class DCF_decoder_stub():
+        # one frame per minute from the DCF77_frame encoder, decoded as DCF_Decoder does
         def __init__(self,local_clock_calendar):
             print("init DCF_decoder_stub")
             self._local_time = local_clock_calendar
-            self.time_zone_num = randint(1,2)
-            self.minutes = randint(1,59)
-            self.hours = randint(0,23)
-            self.month = randint(1,12)
-            self.day = randint(1,31)
-            self.week_day_num = randint(1,7)
-            self.year = randint(20,30)
-             
-        def _change_calendar(self):
-            self.time_zone_num = randint(1,2)
-            self.minutes = randint(1,59)
-            self.hours = randint(0,23)
-            self.day = randint(1,31)
-            self.month = randint(1,12)
-            self.week_day_num = randint(1,7)
-            self.year = randint(20,30)
+            # time zone, minutes, hours, day, week day, month, year: 2024-02-28 23:50 CET, a leap day is coming
+            self._fields = [CET, 50, 23, 28, 3, 2, 24]
+            self._words = [0, 0]
+            self._decoded_fields = [0]*FIELD_COUNT
             
         async def frame_decoder(self):
             while True:
                 D2.off()
-                await uasyncio.sleep(randint(10,20))
+                await uasyncio.sleep(60)
                 D2.on()
-                print("Frame sync")
-                self._change_calendar()
-                self._local_time.sync_time(ustruct.pack("6HB",
-                     self.year, self.month, self.day, self.week_day_num, self.hours, self.minutes, self.time_zone_num))
+                next_minute(self._fields)
+                encode_frame(self._fields, self._words)
+                if frame_parity_is_valid(self._words):
+                    print("Frame sync")
+                    f = self._decoded_fields
+                    decode_fields(self._words, f)
+                    self._local_time.sync_time(ustruct.pack("6HB",
+                         f[YEAR], f[MONTH], f[DAY], f[WEEK_DAY], f[HOURS], f[MINUTES], f[ZONE]))
                 
 ######################### test program     
     def timer_IRQ(timer):
@@ -0,0 +1,189 @@
+"""
+Adaptive classification of the DCF77 pulses.
+
+The decoder measures the low-level duration that precedes each rising edge:
+- about 800 ms : the previous high-level pulse was 200 ms long, logic "1"
+- about 900 ms : the previous high-level pulse was 100 ms long, logic "0"
+- one second more (about 1800 ms or 1900 ms) : the 59th second has no pulse, i.e. "next minute"
+
+The audio path (WebSDR, microphone, envelope circuitry) adds latency and skew that drift
+with the audio level, so instead of fixed windows the classifier learns the two clusters
+online: running mean and running mean absolute deviation of each cluster, integer only
+(fixed-point, x16) so that it runs in IRQ context without heap allocation.
+The decision boundary sits between the two means, weighted by the cluster spreads.
+
+The symbol itself comes from a lookup table: the durations are quantised in BIN_MS bins and
+lut[duration//BIN_MS] is the pulse code of the bin (decided at its centre), minute marker
+included. When a learnt limit moves to another bin, only the bins it crossed are refilled. pulse_lut()
+builds the same table from a tuning profile, for the host tools (batch_decode).
+"""
+from micropython import const
+
+## classification results, bit value = result & 1, minute marker = result & PULSE_MARK
+PULSE_0 = const(0)
+PULSE_1 = const(1)
+PULSE_MARK = const(2)
+PULSE_MARK_0 = const(2)
+PULSE_MARK_1 = const(3)
+PULSE_INVALID = const(4)
+
+SECOND_MS = const(1000)
+_FP_SHIFT = const(4)            # fixed-point: values x16
+_ALPHA_SHIFT = const(4)         # EWMA weight 1/16
+_MIN_SPREAD = const(8 << 4)     # 8 ms
+_MAX_SPREAD = const(40 << 4)    # 40 ms
+_MIN_GAP = const(40 << 4)       # clusters kept at least 40 ms apart
+_SPREAD_LIMIT = const(5)        # accepted up to 5 spreads away from a cluster mean
+_LEARNING_CONFIDENCE = const(128)
+_MARKER_THRESHOLD = const(1400) # ms, longer low-level durations include the missing 59th pulse
+BIN_MS = const(10)              # lookup table resolution
+LUT_BINS = const(256)           # 0 ... 2559 ms, longer durations are invalid
+_BIN_FP = const(10 << 4)
+_HALF_BIN_FP = const(5 << 4)
+_MARKER_BIN = const(1400//10)
+_SECOND_BINS = const(1000//10)
+
+
+def _fill_lut(lut, low_bin, boundary_bin, high_bin, first, last):
+    # bins first ... last of the "1"/"0" durations, and the same bins of the marker durations, one second further
+    for r in range(max(0, first), min(last + 1, LUT_BINS)):
+        if r < low_bin or r > high_bin:
+            code = PULSE_INVALID
+        elif r < boundary_bin:
+            code = PULSE_1
+        else:
+            code = PULSE_0
+        if r < _MARKER_BIN:
+            lut[r] = code
+        b = r + _SECOND_BINS
+        if _MARKER_BIN <= b < LUT_BINS:
+            lut[b] = code if code == PULSE_INVALID else code | PULSE_MARK
+
+
+class AdaptivePulseClassifier():
+    def __init__(self, mean_1=800, mean_0=900, spread=15):
+        self._initial = (mean_1, mean_0, spread)
+        self.confidence = 0   # confidence of the last classification, 0 ... 255
+        self.classified = 0
+        self.rejected = 0
+        # pulse code of each BIN_MS bin of low-level duration, and the bins of the limits it was filled with
+        self.lut = bytearray(PULSE_INVALID for _ in range(LUT_BINS))
+        self._low_bin = LUT_BINS
+        self._boundary_bin = LUT_BINS
+        self._high_bin = LUT_BINS
+        self.reset()
+
+    def reset(self):
+        """ restart learning from the nominal clusters """
+        mean_1, mean_0, spread = self._initial
+        self._mean_1 = mean_1 << _FP_SHIFT
+        self._mean_0 = mean_0 << _FP_SHIFT
+        self._spread_1 = spread << _FP_SHIFT
+        self._spread_0 = spread << _FP_SHIFT
+        self._update_boundaries()
+
+    def set_profile(self, profile):
+        """ tuning profile (mean_1, spread_1, mean_0, spread_0) in ms, as get_clusters(); rebuilds the table """
+        self._mean_1 = profile[0] << _FP_SHIFT
+        self._spread_1 = profile[1] << _FP_SHIFT
+        self._mean_0 = profile[2] << _FP_SHIFT
+        self._spread_0 = profile[3] << _FP_SHIFT
+        self._update_boundaries()
+
+    def _update_boundaries(self):
+        # boundary between "1" and "0", weighted by the spreads of the clusters
+        s1 = self._spread_1
+        s0 = self._spread_0
+        self._boundary = (self._mean_1*s0 + self._mean_0*s1)//(s0 + s1)
+        self._low_limit = self._mean_1 - _SPREAD_LIMIT*s1
+        self._high_limit = self._mean_0 + _SPREAD_LIMIT*s0
+        # first bin with its centre in the window, first "0" bin, last bin in the window
+        low_bin = (self._low_limit - _HALF_BIN_FP + _BIN_FP - 1)//_BIN_FP
+        boundary_bin = (self._boundary - _HALF_BIN_FP + _BIN_FP - 1)//_BIN_FP
+        high_bin = (self._high_limit - _HALF_BIN_FP)//_BIN_FP
+        # a limit moved to another bin: refill the bins between its old and new positions
+        first = LUT_BINS
+        last = -1
+        if low_bin != self._low_bin:
+            first = min(low_bin, self._low_bin)
+            last = max(low_bin, self._low_bin)
+        if boundary_bin != self._boundary_bin:
+            first = min(first, boundary_bin, self._boundary_bin)
+            last = max(last, boundary_bin, self._boundary_bin)
+        if high_bin != self._high_bin:
+            first = min(first, high_bin, self._high_bin)
+            last = max(last, high_bin, self._high_bin)
+        if first <= last:
+            self._low_bin = low_bin
+            self._boundary_bin = boundary_bin
+            self._high_bin = high_bin
+            _fill_lut(self.lut, low_bin, boundary_bin, high_bin, first, last)
+
+    def get_clusters(self):
+        """ (mean_1, spread_1, mean_0, spread_0, boundary) in ms """
+        return (self._mean_1 >> _FP_SHIFT, self._spread_1 >> _FP_SHIFT,
+                self._mean_0 >> _FP_SHIFT, self._spread_0 >> _FP_SHIFT,
+                self._boundary >> _FP_SHIFT)
+
+    def classify(self, duration):
+        """ classify a low-level duration (ms), sets self.confidence; IRQ safe """
+        b = duration//BIN_MS
+        pulse = self.lut[b] if 0 <= b < LUT_BINS else PULSE_INVALID
+        if pulse == PULSE_INVALID:
+            self.confidence = 0
+            self.rejected += 1
+            return PULSE_INVALID
+        self.classified += 1
+        if pulse & PULSE_MARK:
+            duration -= SECOND_MS
+        d = duration << _FP_SHIFT
+        bit = pulse & 1
+        if bit == PULSE_1:
+            mean = self._mean_1
+            spread = self._spread_1
+            margin = self._boundary - d
+            half_gap = self._boundary - mean
+        else:
+            mean = self._mean_0
+            spread = self._spread_0
+            margin = d - self._boundary
+            half_gap = mean - self._boundary
+        # confidence grows with the distance to the boundary and drops beyond 2 spreads from the mean
+        # (no confidence on the wrong side of the boundary, in the bin that contains it)
+        if margin <= 0:
+            confidence = 0
+        else:
+            confidence = 255 if margin >= half_gap else (255*margin)//half_gap
+        deviation = d - mean if d > mean else mean - d
+        if deviation > 2*spread:
+            confidence = (confidence*2*spread)//deviation
+        self.confidence = confidence
+        self._learn(bit, d, deviation, confidence >= _LEARNING_CONFIDENCE)
+        return pulse
+
+    def _learn(self, bit, d, deviation, confident):
+        # the spread learns from every pulse of the window: the confident ones alone (within about
+        # 2 spreads) would give a truncated deviation, biased low, and the window would shrink;
+        # the means only learn from the confident pulses
+        if bit == PULSE_1:
+            if confident:
+                self._mean_1 += (d - self._mean_1) >> _ALPHA_SHIFT
+            spread = self._spread_1 + ((deviation - self._spread_1) >> _ALPHA_SHIFT)
+            self._spread_1 = min(_MAX_SPREAD, max(_MIN_SPREAD, spread))
+        else:
+            if confident:
+                self._mean_0 += (d - self._mean_0) >> _ALPHA_SHIFT
+            spread = self._spread_0 + ((deviation - self._spread_0) >> _ALPHA_SHIFT)
+            self._spread_0 = min(_MAX_SPREAD, max(_MIN_SPREAD, spread))
+        if self._mean_0 - self._mean_1 < _MIN_GAP:
+            # clusters collapsed, restart from the nominal values
+            self.reset()
+        else:
+            self._update_boundaries()
+
+
+def pulse_lut(profile=(800, 15, 900, 15)):
+    """ the lookup table of a tuning profile (mean_1, spread_1, mean_0, spread_0) in ms """
+    classifier = AdaptivePulseClassifier()
+    classifier.set_profile(profile)
+    return classifier.lut
@@ -0,0 +1,128 @@
+"""
+Signal quality metrics of the DCF77 reception, collected by the decoder.
+
+Memory is bounded and preallocated, updates are integer only, so that the edge path
+(DCF_Decoder._process_edges) does not allocate:
+- histograms of the low-level and high-level durations, fixed bins,
+- rolling standard deviation of the second mark intervals (jitter),
+- per-minute counters over the last METRICS_MINUTES minutes: pulses, pulses out of the
+  classifier windows, frames and frames failing parity.
+snapshot() refreshes a preallocated list, read with the indices below.
+"""
+from micropython import const
+from array import array
+
+LOW_BIN_MS = const(20)     # low level: 0 ... 2000 ms, markers included
+LOW_BINS = const(100)
+HIGH_BIN_MS = const(10)    # high level: 0 ... 400 ms
+HIGH_BINS = const(40)
+METRICS_MINUTES = const(16)
+_COUNT_MAX = const(65535)
+_JITTER_SHIFT = const(4)   # jitter computed in units of 16 us ...
+_JITTER_LIMIT = const(50000) # ... on intervals within 50 ms of 1 s (or 2 s at the minute marker)
+_JITTER_ALPHA_SHIFT = const(4)
+
+## snapshot indices
+JITTER_US = const(0)        # rolling standard deviation of the second mark intervals
+OUT_OF_WINDOW = const(1)    # pulses rejected by the classifier, per mille, last METRICS_MINUTES minutes
+PARITY_FAILURES = const(2)  # complete frames failing parity, per mille, last METRICS_MINUTES minutes
+PULSES = const(3)           # pulses received, last METRICS_MINUTES minutes
+FRAMES = const(4)           # complete frames received, last METRICS_MINUTES minutes
+SEPARATION = const(5)       # classifier clusters distance / sum of their spreads, x100 (SNR figure)
+
+
+def _isqrt(n):
+    x = n
+    y = (x + 1) >> 1
+    while y < x:
+        x = y
+        y = (x + n//x) >> 1
+    return x
+
+
+class SignalMetrics():
+    def __init__(self):
+        self.low_histogram = array("H", [0]*LOW_BINS)
+        self.high_histogram = array("H", [0]*HIGH_BINS)
+        # per minute counters, ring indexed by self._minute
+        self._pulses = array("H", [0]*METRICS_MINUTES)
+        self._rejected = array("H", [0]*METRICS_MINUTES)
+        self._frames = array("H", [0]*METRICS_MINUTES)
+        self._parity_failures = array("H", [0]*METRICS_MINUTES)
+        self._minute = 0
+        self._jitter_variance = 0
+        self._snapshot = [0]*6
+
+    def reset(self):
+        for histogram in (self.low_histogram, self.high_histogram, self._pulses, self._rejected,
+                          self._frames, self._parity_failures):
+            for k in range(len(histogram)):
+                histogram[k] = 0
+        self._jitter_variance = 0
+
+    ######################### edge path, no allocation
+    def high_level(self, duration):
+        k = duration//HIGH_BIN_MS
+        if k < 0:
+            k = 0 # first edge, measured from the ticks_us origin
+        elif k >= HIGH_BINS:
+            k = HIGH_BINS - 1
+        if self.high_histogram[k] < _COUNT_MAX:
+            self.high_histogram[k] += 1
+
+    def low_level(self, duration, rejected):
+        k = duration//LOW_BIN_MS
+        if k < 0:
+            k = 0
+        elif k >= LOW_BINS:
+            k = LOW_BINS - 1
+        if self.low_histogram[k] < _COUNT_MAX:
+            self.low_histogram[k] += 1
+        m = self._minute
+        if self._pulses[m] < _COUNT_MAX:
+            self._pulses[m] += 1
+            if rejected:
+                self._rejected[m] += 1
+
+    def second_mark_interval(self, interval_us, marker):
+        deviation = interval_us - (2000000 if marker else 1000000)
+        if deviation > _JITTER_LIMIT or deviation < -_JITTER_LIMIT:
+            return # missing pulses, not jitter
+        deviation >>= _JITTER_SHIFT
+        self._jitter_variance += (deviation*deviation - self._jitter_variance) >> _JITTER_ALPHA_SHIFT
+
+    ######################### frame path
+    def frame_decoded(self, parity_ok):
+        """ called once per complete frame, after the minute marker """
+        m = self._minute
+        self._frames[m] += 1
+        if not parity_ok:
+            self._parity_failures[m] += 1
+        self.next_minute()
+
+    def next_minute(self):
+        m = (self._minute + 1) % METRICS_MINUTES
+        self._minute = m
+        self._pulses[m] = 0
+        self._rejected[m] = 0
+        self._frames[m] = 0
+        self._parity_failures[m] = 0
+
+    def snapshot(self, classifier=None):
+        """ the preallocated snapshot list, refreshed; read it with the snapshot indices """
+        pulses = rejected = frames = failures = 0
+        for m in range(METRICS_MINUTES):
+            pulses += self._pulses[m]
+            rejected += self._rejected[m]
+            frames += self._frames[m]
+            failures += self._parity_failures[m]
+        snapshot = self._snapshot
+        snapshot[JITTER_US] = _isqrt(self._jitter_variance) << _JITTER_SHIFT
+        snapshot[OUT_OF_WINDOW] = 1000*rejected//pulses if pulses else 0
+        snapshot[PARITY_FAILURES] = 1000*failures//frames if frames else 0
+        snapshot[PULSES] = pulses
+        snapshot[FRAMES] = frames
+        if classifier is not None:
+            mean_1, spread_1, mean_0, spread_0, _ = classifier.get_clusters()
+            snapshot[SEPARATION] = 100*(mean_0 - mean_1)//(spread_0 + spread_1)
+        return snapshot
@@ -0,0 +1,92 @@
+"""
+Software trace recorder, drop-in replacement for the logic analyser probes of debug_utility.pulses.
+
+D0 ... D7 have the same on()/off() API as the GPIO probes, but each call records
+(probe_id, ticks_us, edge) into a preallocated ring buffer: no pin, no analyser, no heap
+allocation (IRQ safe). To trace a module, replace
+    from debug_utility.pulses import *
+by
+    from DCF77.trace_recorder import *
+On the host, hostenv.install(trace=True) does the same for every module.
+
+recorder.dump(stream) writes the ring in compact binary form (oldest record first):
+    header  "<4sBBH" : b"DCFT", version, 0, number of records
+    ticks   number of records x uint32 little endian, ticks_us (wraps at 2**30)
+    events  number of records x uint8, probe_id << 1 | edge (1: on, 0: off)
+host/trace_to_perfetto.py converts a dump to Chrome/Perfetto trace JSON.
+"""
+from micropython import const
+from array import array
+import machine, ustruct, utime
+
+TRACE_SIZE = const(512)      # records, power of 2
+_TRACE_MASK = const(512 - 1)
+TRACE_VERSION = const(1)
+
+
+class TraceRecorder():
+    """ clock: timestamp function, utime.ticks_us by default (the host tools may use a wall clock) """
+    def __init__(self, clock=utime.ticks_us):
+        self.clock = clock
+        self._ticks = array("I", [0]*TRACE_SIZE)
+        self._events = bytearray(TRACE_SIZE)
+        self._head = 0
+        self._full = False
+        self.enabled = True
+
+    def record(self, event):
+        if not self.enabled:
+            return
+        irq_state = machine.disable_irq()
+        head = self._head
+        self._ticks[head] = self.clock()
+        self._events[head] = event
+        self._head = (head + 1) & _TRACE_MASK
+        if self._head == 0:
+            self._full = True
+        machine.enable_irq(irq_state)
+
+    def clear(self):
+        self._head = 0
+        self._full = False
+
+    def dump(self, stream):
+        """ binary dump of the ring, see the module docstring for the format """
+        count = TRACE_SIZE if self._full else self._head
+        oldest = self._head if self._full else 0
+        stream.write(ustruct.pack("<4sBBH", b"DCFT", TRACE_VERSION, 0, count))
+        ticks = memoryview(self._ticks)
+        events = memoryview(self._events)
+        if self._full:
+            stream.write(ticks[oldest:])
+            stream.write(ticks[:oldest])
+            stream.write(events[oldest:])
+            stream.write(events[:oldest])
+        else:
+            stream.write(ticks[:count])
+            stream.write(events[:count])
+
+recorder = TraceRecorder()
+
+
+class TraceProbe():
+    def __init__(self, probe_id, trace=recorder):
+        self.probe_id = probe_id
+        self._on = (probe_id << 1) | 1
+        self._off = probe_id << 1
+        self._trace = trace
+
+    def on(self):
+        self._trace.record(self._on)
+
+    def off(self):
+        self._trace.record(self._off)
+
+D0 = TraceProbe(0)
+D1 = TraceProbe(1)
+D2 = TraceProbe(2)
+D3 = TraceProbe(3)
+D4 = TraceProbe(4)
+D5 = TraceProbe(5)
+D6 = TraceProbe(6)
+D7 = TraceProbe(7)